@@ -0,0 +1,222 @@
+# benchmarks the cpu side of update_factorymod.py for every bundled config:
+# loading the yaml, parsing it into models, linking recipes and upgrades, and
+# rendering every factory template.
+#
+# Each stage is compared against the stored baselines, and the rendered
+# wikitext of every factory is compared against stored golden hashes, so
+# performance work can't silently change what gets written to the wiki.
+#
+# Timings are machine specific. Run with --update on your own machine first
+# (after checking the golden hashes still pass), then compare against that.
+#
+# usage:
+# python3 benchmarks/factorymod.py
+# python3 benchmarks/factorymod.py --server civmc --repeat 20
+# python3 benchmarks/factorymod.py --update
+
+import hashlib
+import io
+import json
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from pathlib import Path
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+from civwiki_tools.factorymod import Config, parse_factorymod  # noqa: E402
+from update_factorymod import FactoryModPrinter, config_files  # noqa: E402
+
+BASELINES = Path(__file__).parent / "baselines.json"
+
+
+def render_all(config):
+    return {
+        factory.key: FactoryModPrinter(config, factory).get_value()
+        for factory in config.factories
+    }
+
+
+def stages(path):
+    """
+    The benchmarked stages for the config at ``path``, as (name, function)
+    pairs. The input of each stage is prepared up front, so only the stage
+    itself is measured.
+    """
+    with open(path) as f:
+        text = f.read()
+    data = yaml.safe_load(text)
+    config = parse_factorymod(data)
+    factory_name = config.factories[0].name
+
+    return [
+        ("yaml.safe_load", lambda: yaml.safe_load(text)),
+        ("Config.parse", lambda: Config.parse(data)),
+        ("parse_factorymod", lambda: parse_factorymod(data)),
+        (
+            "parse_factorymod (single factory)",
+            lambda: parse_factorymod(data, factory=factory_name),
+        ),
+        ("FactoryModPrinter.get_value", lambda: render_all(config)),
+    ]
+
+
+def render_each(path):
+    """
+    Render every factory from a config parsed for just that factory, as
+    update_factorymod.py --factory <name> does.
+    """
+    with open(path) as f:
+        data = yaml.safe_load(f)
+
+    rendered = {}
+    with redirect_stdout(io.StringIO()):
+        for factory_data in data["factories"].values():
+            config = parse_factorymod(data, factory=factory_data["name"])
+            for factory in config.factories:
+                if factory.name == factory_data["name"]:
+                    rendered[factory.key] = FactoryModPrinter(
+                        config, factory
+                    ).get_value()
+    return rendered
+
+
+def measure(f, *, repeat, warmup):
+    # parse_factorymod prints warnings about missing recipes. Keep them out of
+    # the results (and the timings).
+    with redirect_stdout(io.StringIO()):
+        # the first runs pay for cold caches and allocator growth
+        for _ in range(warmup):
+            f()
+        seconds = min(_time(f) for _ in range(repeat))
+
+        tracemalloc.start()
+        result = f()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {"seconds": seconds, "peak_bytes": peak_bytes}, result
+
+
+def _time(f):
+    start = time.perf_counter()
+    f()
+    return time.perf_counter() - start
+
+
+def golden(rendered):
+    return {
+        key: hashlib.sha256(text.encode()).hexdigest() for key, text in rendered.items()
+    }
+
+
+def run(server, *, repeat, warmup):
+    results = {"timings": {}, "golden": {}}
+    for name, f in stages(config_files[server]):
+        results["timings"][name], value = measure(f, repeat=repeat, warmup=warmup)
+        if name == "FactoryModPrinter.get_value":
+            results["golden"] = golden(value)
+    results["golden_single"] = golden(render_each(config_files[server]))
+    return results
+
+
+def compare(results, baseline, *, time_threshold, time_floor, memory_threshold):
+    """
+    Print a comparison of ``results`` against ``baseline`` and return whether
+    it passed.
+
+    A stage is only slower if it takes more than ``time_threshold`` times its
+    baseline *and* more than ``time_floor`` seconds longer. Stages which take
+    a few milliseconds vary by more than any sensible threshold from run to
+    run.
+    """
+    ok = True
+    for name, timing in results["timings"].items():
+        base = baseline["timings"].get(name)
+        if base is None:
+            print(f"  {name}: {timing['seconds']:.4f}s (no baseline)")
+            continue
+
+        time_ratio = timing["seconds"] / base["seconds"]
+        memory_ratio = timing["peak_bytes"] / base["peak_bytes"]
+        slower = (
+            time_ratio > time_threshold
+            and timing["seconds"] - base["seconds"] > time_floor
+        )
+        regressed = slower or memory_ratio > memory_threshold
+        ok = ok and not regressed
+        print(
+            f"  {name}: {timing['seconds']:.4f}s ({time_ratio:.2f}x), "
+            f"{timing['peak_bytes'] / 1024 / 1024:.1f} MiB peak "
+            f"({memory_ratio:.2f}x){' REGRESSION' if regressed else ''}"
+        )
+
+    expected = baseline["golden"]
+    for name, actual in [
+        ("rendered wikitext", results["golden"]),
+        ("rendered wikitext (single factory parse)", results["golden_single"]),
+    ]:
+        changed = sorted(
+            key
+            for key in expected.keys() | actual.keys()
+            if expected.get(key) != actual.get(key)
+        )
+        if changed:
+            ok = False
+            print(f"  {name} changed for {len(changed)} factories: {changed}")
+        else:
+            print(f"  {name} unchanged for {len(actual)} factories")
+
+    return ok
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--server", choices=list(config_files), default=None)
+    # each stage is timed as the fastest of --repeat runs, after --warmup
+    # untimed runs
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--update", action="store_true", default=False)
+    # a stage fails if it takes more than this multiple of its baseline, and
+    # more than --time-floor seconds longer than it
+    parser.add_argument("--time-threshold", type=float, default=1.5)
+    parser.add_argument("--time-floor", type=float, default=0.05)
+    parser.add_argument("--memory-threshold", type=float, default=1.2)
+    args = parser.parse_args()
+
+    servers = [args.server] if args.server else list(config_files)
+    baselines = json.loads(BASELINES.read_text()) if BASELINES.exists() else {}
+
+    ok = True
+    for server in servers:
+        print(server)
+        results = run(server, repeat=args.repeat, warmup=args.warmup)
+        if args.update:
+            # the single factory renders are checked against the same hashes
+            baselines[server] = {
+                "timings": results["timings"],
+                "golden": results["golden"],
+            }
+            continue
+        if server not in baselines:
+            print("  no baseline. Run with --update to create one")
+            ok = False
+            continue
+        ok &= compare(
+            results,
+            baselines[server],
+            time_threshold=args.time_threshold,
+            time_floor=args.time_floor,
+            memory_threshold=args.memory_threshold,
+        )
+
+    if args.update:
+        BASELINES.write_text(json.dumps(baselines, indent=4, sort_keys=True) + "\n")
+        print(f"wrote {BASELINES}")
+
+    sys.exit(0 if ok else 1)
@@ -1,32 +1,49 @@
 from pathlib import Path
 
-from pywikibot.config import usernames
-from pywikibot.login import ClientLoginManager
+__all__ = ["site"]
 
-from civwiki_tools.utils import site
 
-__all__ = ["site"]
+def _login(site):
+    # pywikibot is only imported here, so that modules which never touch the
+    # site don't depend on its configuration either.
+    from pywikibot.config import usernames
+    from pywikibot.login import ClientLoginManager
+
+    mod = {}
+    with open(Path(__file__).parent.parent / "config.py") as f:
+        source = f.read()
+
+    exec(source, mod)
+
+    family_name = site.family.name
+    # username is retrieved from pywikibot after it parses user-config.py.
+    # password is retrieved separately by us from config.py.
+    # pywikibot was not really built to be used as a library...this was the
+    # nicest solution I could find that still gave me a reasonable amount of
+    # control over when and how logins happen.
+    user = usernames[family_name]["en"]
+    password = mod["password"]
+
+    manager = ClientLoginManager(user=user, password=password, site=site)
+    manager.login()
+
+    # force a re-fetch of site information. Even though we just logged in,
+    # pywikibot keeps information for an anonymous user here, and we need to
+    # tell it to update for our freshly logged in user.
+    del site.userinfo
+    del site.tokens
+
+
+def __getattr__(name):
+    # log in the first time something asks for the site, rather than on
+    # import. Logging in needs config.py and the network, which code that
+    # only parses configs, renders templates or talks to a stand-in server
+    # shouldn't.
+    if name != "site":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    from civwiki_tools.utils import site
 
-mod = {}
-with open(Path(__file__).parent.parent / "config.py") as f:
-    source = f.read()
-
-exec(source, mod)
-
-family_name = site.family.name
-# username is retrieved from pywikibot after it parses user-config.py.
-# password is retrieved separately by us from config.py.
-# pywikibot was not really built to be used as a library...this was the nicest
-# solution I could find that still gave me a reasonable amount of control over
-# when and how logins happen.
-user = usernames[family_name]["en"]
-password = mod["password"]
-
-manager = ClientLoginManager(user=user, password=password, site=site)
-manager.login()
-
-# force a re-fetch of site information. Even though we just logged in, pywikibot
-# keeps information for an anonymous user here, and we need to tell it to update
-# for our freshly logged in user.
-del site.userinfo
-del site.tokens
+    _login(site)
+    globals()["site"] = site
+    return site
@@ -0,0 +1,167 @@
+import asyncio
+
+import aiohttp
+from pywikibot.exceptions import APIError
+
+API_URL = "https://civwiki.org/w/api.php"
+
+
+async def _aiter(iterable):
+    if hasattr(iterable, "__aiter__"):
+        async for item in iterable:
+            yield item
+    else:
+        for item in iterable:
+            yield item
+
+
+class AsyncSite:
+    """
+    A read-only asyncio client for the wiki's api, for bulk reads which would
+    otherwise go through pywikibot one request at a time.
+
+    Requests share one pooled connection, and at most ``concurrency`` are in
+    flight at once across everything using this client. Pass ``api_url`` to
+    point it somewhere other than civwiki, e.g. a local stand-in server.
+
+    Usage:
+
+        async with AsyncSite() as site:
+            members = site.category_members("Category:Civilizations")
+            async for title, text in site.page_texts(members):
+                ...
+    """
+
+    def __init__(self, api_url=API_URL, *, concurrency=8):
+        self.api_url = api_url
+        self.concurrency = concurrency
+        self.session = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+            headers={"User-Agent": "civwiki_tools"},
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+        self.session = None
+
+    async def query(self, **params):
+        params = {
+            "action": "query",
+            "format": "json",
+            "formatversion": "2",
+            **params,
+        }
+        async with self._semaphore:
+            async with self.session.get(self.api_url, params=params) as r:
+                r.raise_for_status()
+                data = await r.json()
+
+        if "error" in data:
+            raise APIError(data["error"]["code"], data["error"]["info"])
+        return data
+
+    async def _continued(self, list_name, **params):
+        # continuations of a single list depend on each other, so these are
+        # necessarily sequential. Independent lists and batches still run
+        # concurrently with each other.
+        continue_params = {}
+        while True:
+            data = await self.query(list=list_name, **params, **continue_params)
+            for item in data["query"][list_name]:
+                yield item
+            if "continue" not in data:
+                return
+            continue_params = data["continue"]
+
+    async def category_members(self, title, *, namespaces=None):
+        """
+        Titles of the pages in the category ``title``.
+        """
+        params = {"cmtitle": title, "cmlimit": "max"}
+        if namespaces is not None:
+            params["cmnamespace"] = "|".join(str(ns) for ns in namespaces)
+        async for member in self._continued("categorymembers", **params):
+            yield member["title"]
+
+    async def backlinks(self, title, *, namespaces=None):
+        """
+        Titles of the pages which link to ``title``.
+        """
+        params = {"bltitle": title, "bllimit": "max"}
+        if namespaces is not None:
+            params["blnamespace"] = "|".join(str(ns) for ns in namespaces)
+        async for backlink in self._continued("backlinks", **params):
+            yield backlink["title"]
+
+    async def _page_texts(self, titles):
+        texts = {}
+        continue_params = {}
+        while True:
+            data = await self.query(
+                prop="revisions",
+                rvprop="content",
+                rvslots="main",
+                titles="|".join(titles),
+                **continue_params,
+            )
+            for page in data["query"]["pages"]:
+                title = page["title"]
+                if "missing" in page or "invalid" in page:
+                    texts[title] = None
+                    continue
+                # if the batch's text doesn't fit in one response, the pages
+                # which didn't make it are listed without revisions, and come
+                # with them in a continuation.
+                if not page.get("revisions"):
+                    texts.setdefault(title, None)
+                    continue
+                # hidden (revision deleted) text has no content
+                texts[title] = page["revisions"][0]["slots"]["main"].get("content")
+            if "continue" not in data:
+                return list(texts.items())
+            continue_params = data["continue"]
+
+    async def page_texts(self, titles, *, batch_size=50):
+        """
+        Yield ``(title, text)`` for each title in ``titles``, which may be a
+        plain or an async iterable. ``text`` is None if the page does not
+        exist, or its text is hidden.
+
+        Titles are fetched ``batch_size`` per request (50 is the api's limit
+        for content of multiple pages), and batches are requested as soon as
+        they fill up, concurrently with each other and with reading
+        ``titles``. Pages are yielded in the order their batches complete,
+        not in the order of ``titles``.
+        """
+        pending = set()
+        try:
+            batch = []
+            async for title in _aiter(titles):
+                batch.append(title)
+                if len(batch) == batch_size:
+                    pending.add(asyncio.create_task(self._page_texts(batch)))
+                    batch = []
+
+                for task in [task for task in pending if task.done()]:
+                    pending.remove(task)
+                    for item in task.result():
+                        yield item
+
+            if batch:
+                pending.add(asyncio.create_task(self._page_texts(batch)))
+
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    for item in task.result():
+                        yield item
+        finally:
+            for task in pending:
+                task.cancel()
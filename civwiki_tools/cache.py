@@ -0,0 +1,139 @@
+import sqlite3
+from datetime import timedelta
+from typing import NamedTuple
+
+from pywikibot import Timestamp
+
+from civwiki_tools.utils import CACHE
+
+# MediaWiki only keeps recent changes for $wgRCMaxAge (90 days by default). If
+# we last synced longer ago than this, we can't tell what changed in between,
+# and have to throw the whole cache away. Stay comfortably inside the limit.
+RC_MAX_AGE = timedelta(days=30)
+
+
+class CachedPage(NamedTuple):
+    title: str
+    # None if the page does not exist
+    revid: int | None
+    text: str
+
+
+class PageCache:
+    """
+    A local sqlite cache of page texts, shared between all scripts.
+
+    Entries are never refetched on a timer. Instead, every ``sync`` asks the
+    wiki for the recent changes since the previous sync and drops just the
+    pages which changed. Reads of anything else are local lookups.
+    """
+
+    def __init__(self, site, path=CACHE / "pages.sqlite"):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.site = site
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS pages "
+            "(title TEXT PRIMARY KEY, revid INTEGER, text TEXT NOT NULL)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self.sync()
+
+    def _meta(self, key):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _set_meta(self, key, value):
+        self.db.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+        )
+
+    def sync(self):
+        """
+        Invalidate every cached page which has changed on the wiki since the
+        last sync.
+        """
+        # take the time before polling, so anything which happens while we're
+        # polling is picked up again next sync rather than missed.
+        now = self.site.server_time()
+        last_sync = self._meta("last_sync")
+        if last_sync is not None:
+            last_sync = Timestamp.fromISOformat(last_sync)
+
+        with self.db:
+            if last_sync is None or now - last_sync > RC_MAX_AGE:
+                self.db.execute("DELETE FROM pages")
+            else:
+                for change in self.site.recentchanges(start=last_sync, reverse=True):
+                    # log entries (deletes, moves, protections...) have a revid
+                    # of 0, and always invalidate.
+                    revid = change.get("revid", 0)
+                    titles = [change["title"]]
+                    # moves also change the page at the target title
+                    if "target_title" in change.get("logparams", {}):
+                        titles.append(change["logparams"]["target_title"])
+                    for title in titles:
+                        # edits we made ourselves were already stored by
+                        # update(), so don't throw those away.
+                        self.db.execute(
+                            "DELETE FROM pages WHERE title = ? "
+                            "AND (revid IS NULL OR revid != ?)",
+                            (title, revid),
+                        )
+            self._set_meta("last_sync", now.isoformat())
+
+    def get(self, title) -> CachedPage:
+        """
+        The cached page at ``title``, fetching and storing it first if it
+        isn't cached.
+        """
+        page = self.site.page(title)
+        title = page.title()
+        row = self.db.execute(
+            "SELECT title, revid, text FROM pages WHERE title = ?", (title,)
+        ).fetchone()
+        if row is not None:
+            return CachedPage(*row)
+        return self.update(page)
+
+    def preload(self, titles):
+        """
+        Fetch and store every page in ``titles`` which isn't cached yet, many
+        pages per request.
+        """
+        pages = []
+        for title in titles:
+            page = self.site.page(title)
+            row = self.db.execute(
+                "SELECT 1 FROM pages WHERE title = ?", (page.title(),)
+            ).fetchone()
+            if row is None:
+                pages.append(page)
+
+        for page in self.site.preloadpages(pages):
+            self.update(page)
+
+    def text(self, title) -> str:
+        """
+        Cached equivalent of ``site.page(title).text``.
+        """
+        return self.get(title).text
+
+    def update(self, page) -> CachedPage:
+        """
+        Store the current state of ``page``. Call this after saving a page to
+        keep the cache up to date without a refetch.
+        """
+        if page.exists():
+            cached = CachedPage(page.title(), page.latest_revision_id, page.text)
+        else:
+            cached = CachedPage(page.title(), None, "")
+
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO pages (title, revid, text) VALUES (?, ?, ?)",
+                cached,
+            )
+        return cached
@@ -0,0 +1,324 @@
+from bisect import bisect_left
+from collections import Counter
+from functools import cached_property
+
+# A line diff for edit previews. Lines are hashed to integer ids up front so the
+# diff itself only ever compares ints, lines which only appear on one side are
+# set aside before diffing (they can never match anything), and the remaining
+# lines are diffed with Myers' O(ND) algorithm.
+#
+# Myers is quadratic in the number of differences, so past MAX_D differences we
+# give up on a minimal diff and fall back to patience diff: match up lines
+# which are unique on both sides, then diff each gap between those matches the
+# same way, with Myers wherever the gap is small enough. Gaps are much smaller
+# than the whole text, and lines which repeat across the page are often unique
+# within a gap, so this stays close to minimal on large edits too. Gaps with
+# nothing unique in them at all are split in half until Myers can handle them.
+#
+# Nothing is computed until a summary or the full diff is asked for.
+
+MAX_D = 1000
+
+
+def _patience(a, b):
+    """
+    Indices ``(i, j)`` of a longest increasing run of lines which appear
+    exactly once in both ``a`` and ``b``.
+    """
+    a_counts = Counter(a)
+    b_counts = Counter(b)
+    b_positions = {line: j for j, line in enumerate(b) if b_counts[line] == 1}
+    pairs = [
+        (i, b_positions[line])
+        for i, line in enumerate(a)
+        if a_counts[line] == 1 and line in b_positions
+    ]
+
+    # longest increasing subsequence of the b positions, by patience sorting
+    tops = []
+    tops_index = []
+    previous = []
+    for index, (_, j) in enumerate(pairs):
+        pile = bisect_left(tops, j)
+        if pile == len(tops):
+            tops.append(j)
+            tops_index.append(index)
+        else:
+            tops[pile] = j
+            tops_index[pile] = index
+        previous.append(tops_index[pile - 1] if pile > 0 else None)
+
+    matches = []
+    index = tops_index[-1] if tops_index else None
+    while index is not None:
+        matches.append(pairs[index])
+        index = previous[index]
+    matches.reverse()
+    return matches
+
+
+def _myers(a, b):
+    """
+    Indices ``(i, j)`` of the lines where ``a[i] == b[j]`` in a shortest edit
+    script from ``a`` to ``b``, in increasing order. None if that script would
+    have more than MAX_D edits.
+    """
+    n, m = len(a), len(b)
+    v = {1: 0}
+    trace = []
+    for d in range(n + m + 1):
+        if d > MAX_D:
+            return None
+        trace.append(v.copy())
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                break
+        else:
+            continue
+        break
+
+    # walk back through the trace to recover the diagonals we took
+    matches = []
+    x, y = n, m
+    for d in reversed(range(len(trace))):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k - 1] < v[k + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[prev_k]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            matches.append((x, y))
+        x, y = prev_x, prev_y
+
+    matches.reverse()
+    return matches
+
+
+def _patience_diff(a, b):
+    """
+    Like ``_myers``, but never gives up. The result is not necessarily
+    minimal.
+    """
+    # common prefix and suffix match trivially, and leave more lines unique
+    # in what's left
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a_middle = a[start : len(a) - end]
+    b_middle = b[start : len(b) - end]
+
+    middle = _myers(a_middle, b_middle)
+    if middle is None:
+        middle = []
+        anchors = _patience(a_middle, b_middle)
+        if not anchors and len(a_middle) > 1 and len(b_middle) > 1:
+            # nothing is unique to anchor on (e.g. a long run of identical
+            # table rows). Scattered edits barely shift the two halves against
+            # each other, so diff them separately, and only lose matches near
+            # the split.
+            middle = _split(a_middle, b_middle)
+        elif anchors:
+            # diff the gaps before, between and after the anchors
+            anchors.append((len(a_middle), len(b_middle)))
+        i0 = j0 = 0
+        for i, j in anchors:
+            gap = _patience_diff(a_middle[i0:i], b_middle[j0:j])
+            middle += [(i0 + gi, j0 + gj) for gi, gj in gap]
+            if i < len(a_middle):
+                middle.append((i, j))
+            i0, j0 = i + 1, j + 1
+
+    matches = [(i, i) for i in range(start)]
+    matches += [(start + i, start + j) for i, j in middle]
+    matches += [(len(a) - end + i, len(b) - end + i) for i in range(end)]
+    return matches
+
+
+def _split(a, b):
+    i, j = len(a) // 2, len(b) // 2
+    matches = _patience_diff(a[:i], b[:j])
+    matches += [(i + mi, j + mj) for mi, mj in _patience_diff(a[i:], b[j:])]
+    return matches
+
+
+def _opcodes(matches, n, m):
+    # difflib style (tag, i1, i2, j1, j2) opcodes from matching line pairs
+    opcodes = []
+    i = j = 0
+    for mi, mj in [*matches, (n, m)]:
+        if i < mi and j < mj:
+            opcodes.append(("replace", i, mi, j, mj))
+        elif i < mi:
+            opcodes.append(("delete", i, mi, j, j))
+        elif j < mj:
+            opcodes.append(("insert", i, i, j, mj))
+
+        if mi == n and mj == m:
+            break
+        if opcodes and opcodes[-1][0] == "equal":
+            _, i1, _, j1, _ = opcodes.pop()
+            opcodes.append(("equal", i1, mi + 1, j1, mj + 1))
+        else:
+            opcodes.append(("equal", mi, mi + 1, mj, mj + 1))
+        i, j = mi + 1, mj + 1
+    return opcodes
+
+
+class Diff:
+    """
+    The line diff between two texts, computed only on request.
+
+    ``summary()`` gives a one line overview suitable for printing for every
+    page of a bulk run, and ``unified()`` gives the full diff.
+    """
+
+    def __init__(self, old, new):
+        self.old = old
+        self.new = new
+
+    @property
+    def changed(self):
+        return self.old != self.new
+
+    @cached_property
+    def old_lines(self):
+        return self.old.split("\n")
+
+    @cached_property
+    def new_lines(self):
+        return self.new.split("\n")
+
+    @cached_property
+    def opcodes(self):
+        old_lines = self.old_lines
+        new_lines = self.new_lines
+
+        ids = {}
+        a = [ids.setdefault(line, len(ids)) for line in old_lines]
+        b = [ids.setdefault(line, len(ids)) for line in new_lines]
+
+        # common prefix and suffix are cheap to take off first
+        start = 0
+        while start < len(a) and start < len(b) and a[start] == b[start]:
+            start += 1
+        end = 0
+        while (
+            end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]
+        ):
+            end += 1
+
+        # only lines present on both sides can match. Diffing just those keeps
+        # large rewrites cheap.
+        in_a = set(a[start : len(a) - end])
+        in_b = set(b[start : len(b) - end])
+        a_index = [i for i in range(start, len(a) - end) if a[i] in in_b]
+        b_index = [j for j in range(start, len(b) - end) if b[j] in in_a]
+
+        a_common = [a[i] for i in a_index]
+        b_common = [b[j] for j in b_index]
+        middle = _patience_diff(a_common, b_common)
+
+        matches = [(i, i) for i in range(start)]
+        matches += [(a_index[i], b_index[j]) for i, j in middle]
+        matches += [(len(a) - end + i, len(b) - end + i) for i in range(end)]
+        return _opcodes(matches, len(a), len(b))
+
+    def summary(self):
+        """
+        Lines and bytes added and removed, e.g. ``+3 -1 lines, +120 -40 bytes``.
+        """
+        lines_added = lines_removed = bytes_added = bytes_removed = 0
+        for tag, i1, i2, j1, j2 in self.opcodes:
+            if tag == "equal":
+                continue
+            lines_removed += i2 - i1
+            lines_added += j2 - j1
+            bytes_removed += sum(
+                len(line.encode()) + 1 for line in self.old_lines[i1:i2]
+            )
+            bytes_added += sum(len(line.encode()) + 1 for line in self.new_lines[j1:j2])
+
+        return (
+            f"+{lines_added} -{lines_removed} lines, "
+            f"+{bytes_added} -{bytes_removed} bytes"
+        )
+
+    def unified(self, *, context=3):
+        """
+        The full diff, in the same format as ``difflib.unified_diff``.
+        """
+        out = []
+        for group in self._grouped_opcodes(context):
+            i1, i2 = group[0][1], group[-1][2]
+            j1, j2 = group[0][3], group[-1][4]
+            out.append(f"@@ -{_range(i1, i2)} +{_range(j1, j2)} @@")
+            for tag, i1, i2, j1, j2 in group:
+                if tag == "equal":
+                    out += [f" {line}" for line in self.old_lines[i1:i2]]
+                    continue
+                out += [f"-{line}" for line in self.old_lines[i1:i2]]
+                out += [f"+{line}" for line in self.new_lines[j1:j2]]
+
+        if out:
+            out = ["---", "+++", *out]
+        return "\n".join(out)
+
+    def _grouped_opcodes(self, context):
+        # changes with up to ``context`` unchanged lines around them, merging
+        # changes which are close enough together to share context.
+        groups = []
+        group = []
+        for tag, i1, i2, j1, j2 in self.opcodes:
+            if tag != "equal":
+                group.append((tag, i1, i2, j1, j2))
+                continue
+
+            if group:
+                if i2 - i1 > 2 * context:
+                    group.append((tag, i1, i1 + context, j1, j1 + context))
+                    groups.append(group)
+                    group = []
+                else:
+                    group.append((tag, i1, i2, j1, j2))
+                    continue
+            # leading context of the next change
+            i1, j1 = max(i1, i2 - context), max(j1, j2 - context)
+            group.append((tag, i1, i2, j1, j2))
+
+        # a group which is only leading context has no changes in it
+        if group and any(tag != "equal" for tag, *_ in group):
+            if group[-1][0] == "equal":
+                tag, i1, i2, j1, j2 = group.pop()
+                group.append(
+                    (tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context))
+                )
+            groups.append(group)
+        return groups
+
+
+def _range(start, stop):
+    # unified diff line ranges are 1 indexed, and written differently for
+    # empty and single line ranges
+    length = stop - start
+    if length == 1:
+        return f"{start + 1}"
+    if length == 0:
+        return f"{start},0"
+    return f"{start + 1},{length}"
@@ -0,0 +1,21 @@
+from pywikibot.xmlreader import XmlDump
+
+# Offline candidate discovery over a MediaWiki XML dump (Special:Export, or
+# maintenance/dumpBackup.php --current). The bulk-edit scripts otherwise fetch
+# every page they might touch; scanning a dump locally lets them fetch and edit
+# only the pages which will actually change.
+#
+# XmlDump parses with iterparse and clears each <page> element once it's
+# consumed, so memory stays constant regardless of dump size.
+
+
+def iter_pages(path, *, namespaces=None):
+    """
+    Yield the latest revision (a pywikibot XmlEntry) of every page in the dump
+    at ``path``. If ``namespaces`` is passed, only pages in those namespace
+    numbers are yielded.
+    """
+    for entry in XmlDump(path, revisions="latest").parse():
+        if namespaces is not None and int(entry.ns) not in namespaces:
+            continue
+        yield entry
@@ -263,12 +263,128 @@ class Config(Model):
     # both are a mapping of factory_name to list[(upgrade_recipe, Factory)]
     # upgrades_to: dict[str, list[(recipe, Factory)]]
     # upgrades_from: dict[str, list[(recipe, Factory)]]
+    # set by parse_factorymod(index=True).
+    # index: ItemIndex
 
 
-def parse_factorymod(data):
+def item_key(item):
+    """
+    The key identifying the item of a Quantity, SetupCost or Fuel. Custom items
+    are identified by their custom key, and everything else by material.
+    """
+    return getattr(item, "custom_key", None) or item.type or item.material
+
+
+class ItemIndex:
+    """
+    Mapping of item keys (see ``item_key``) to the recipes which produce and
+    consume them, and the factories which take them to set up.
+    """
+
+    def __init__(self):
+        # plain dicts rather than defaultdicts, so that looking up an item
+        # never adds it: whether an item is in ``produced_by`` says whether
+        # anything makes it (see planner.plan). Look items up with ``.get``.
+        # item key -> list[(Factory, Recipe)]
+        self.produced_by = {}
+        self.consumed_by = {}
+        # item key -> list[Factory]
+        self.setup_for = {}
+
+    def items(self):
+        return list(
+            dict.fromkeys([*self.produced_by, *self.consumed_by, *self.setup_for])
+        )
+
+    def add_factory(self, factory):
+        for key in dict.fromkeys(item_key(cost) for cost in factory.setupcost or []):
+            self.setup_for.setdefault(key, []).append(factory)
+
+        # fields missing from the yaml are None, not empty
+        for recipe in factory.recipes or []:
+            outputs = list(recipe.output or [])
+            for random_output in recipe.outputs or []:
+                outputs += random_output.quantities or []
+
+            # an item may appear in a recipe more than once, e.g. as the
+            # output of several random outcomes. Index the recipe once.
+            for key in dict.fromkeys(item_key(q) for q in outputs):
+                self.produced_by.setdefault(key, []).append((factory, recipe))
+            for key in dict.fromkeys(item_key(q) for q in recipe.input or []):
+                self.consumed_by.setdefault(key, []).append((factory, recipe))
+
+
+def _upgrade_targets(factory_data, recipes_data):
+    # (recipe key, factory name) for each upgrade recipe of a factory, straight
+    # from the yaml.
+    for recipe_key in factory_data.get("recipes") or []:
+        recipe = recipes_data.get(recipe_key)
+        if recipe is None or recipe.get("type") != RecipeType.UPGRADE.value:
+            continue
+        if recipe.get("factory") is None:
+            continue
+        yield (recipe_key, recipe["factory"])
+
+
+def _factory_subset(data, factory_name):
+    """
+    The parts of ``data`` needed to render the factory named ``factory_name``:
+    that factory and all of its recipes, the factories it upgrades to, and the
+    factories which upgrade to it along with just those upgrade recipes.
+
+    Works on the raw yaml, so nothing outside of this is ever parsed into
+    models.
+    """
+    factories_data = data["factories"]
+    recipes_data = data["recipes"]
+
+    targets = set()
+    for factory_data in factories_data.values():
+        if factory_data["name"] == factory_name:
+            targets |= {t for _, t in _upgrade_targets(factory_data, recipes_data)}
+
+    factories = {}
+    recipe_keys = set()
+    for key, factory_data in factories_data.items():
+        if factory_data["name"] == factory_name:
+            factories[key] = factory_data
+            recipe_keys.update(factory_data.get("recipes") or [])
+            continue
+
+        upgrades_into = [
+            recipe_key
+            for recipe_key, target in _upgrade_targets(factory_data, recipes_data)
+            if target == factory_name
+        ]
+        if upgrades_into or factory_data["name"] in targets:
+            # none of this factory's other recipes are needed
+            factories[key] = {**factory_data, "recipes": upgrades_into}
+            recipe_keys.update(upgrades_into)
+
+    if not any(f["name"] == factory_name for f in factories.values()):
+        raise ValueError(
+            f"no factory named {factory_name}. Expected one of "
+            f"{[f['name'] for f in factories_data.values()]}"
+        )
+
+    recipes = {k: v for k, v in recipes_data.items() if k in recipe_keys}
+    return {**data, "factories": factories, "recipes": recipes}
+
+
+def parse_factorymod(data, *, factory=None, index=False):
     """
     Parse a .yaml factorymod config.
+
+    If ``factory`` is passed, only the parts of the config needed to render the
+    factory with that name are parsed. The returned config then contains that
+    factory, plus the factories it upgrades to or from with only their
+    connecting upgrade recipes.
+
+    If ``index`` is true, ``config.index`` is set to an ItemIndex of every item
+    in the config.
     """
+    if factory is not None:
+        data = _factory_subset(data, factory)
     config = Config.parse(data)
 
     # process factory recipe names to actually be the full recipe
@@ -304,4 +420,9 @@ def parse_factorymod(data):
 
     config.upgrades_to = upgrades_to
     config.upgrades_from = upgrades_from
+
+    if index:
+        config.index = ItemIndex()
+        for factory in config.factories:
+            config.index.add_factory(factory)
     return config
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+
+from civwiki_tools.utils import CACHE
+
+
+class Journal:
+    """
+    A durable, append-only record of the pages a bulk run planned to touch and
+    the ones it has finished with, so an interrupted run can be resumed
+    without redoing any of them.
+
+    Each job (identified by ``name``, plus ``params`` describing what the run
+    does) writes to ``cache/journals/<name>-<hash of params>.jsonl``, so runs
+    of the same script for different params never touch each other's
+    journals. Starting a run without ``resume`` begins a fresh journal. With
+    ``resume``, pages already completed by the previous run of the same job
+    are reported as done.
+    """
+
+    def __init__(self, name, params=None, *, resume=False):
+        digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode())
+        path = CACHE / "journals" / f"{name}-{digest.hexdigest()[:16]}.jsonl"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.completed = set()
+
+        if resume and path.exists():
+            entries = self._read(path)
+            job = next((e for e in entries if e["op"] == "start"), None)
+            if job is not None and job["params"] != params:
+                raise ValueError(
+                    f"can't resume {name}: the previous run was for "
+                    f"{job['params']}, not {params}"
+                )
+            self.completed = {e["title"] for e in entries if e["op"] == "complete"}
+            self.file = open(path, "a")
+        else:
+            self.file = open(path, "w")
+            self._append({"op": "start", "params": params})
+
+    @staticmethod
+    def _read(path):
+        entries = []
+        length = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+                length += len(line)
+
+        # the last line may be cut short if we died while writing it. Anything
+        # it recorded didn't happen as far as we know, so drop it before we
+        # append after it.
+        os.truncate(path, length)
+        return entries
+
+    def _append(self, entry):
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def plan(self, titles):
+        """
+        Record the pages this run is going to work through.
+        """
+        remaining = [title for title in titles if title not in self.completed]
+        for title in remaining:
+            self._append({"op": "plan", "title": title})
+        if self.completed:
+            print(
+                f"resuming: {len(titles) - len(remaining)} of {len(titles)} "
+                "pages already done"
+            )
+
+    def is_done(self, title):
+        return title in self.completed
+
+    def complete(self, title):
+        """
+        Record that ``title`` is finished with, whether it was edited or didn't
+        need to be. Pages which failed should not be completed, so a resumed
+        run retries them.
+        """
+        self._append({"op": "complete", "title": title})
+        self.completed.add(title)
@@ -0,0 +1,397 @@
+import json
+import math
+from collections import defaultdict, deque
+from typing import NamedTuple
+
+from civwiki_tools.factorymod import ItemIndex, RecipeType, item_key
+
+# Cheapest ways to make every item of a factorymod config from raw materials.
+#
+# Recipes are hyperedges from their input items (plus fuel, plus optionally a
+# share of what the factory cost to set up) to their output items. An item's
+# cost is the cheapest of the recipes producing it, per unit produced, and a
+# factory's cost is the cheapest of setting it up directly or upgrading to it
+# from another factory. Costs are found by relaxing recipes until nothing gets
+# cheaper: whenever a cost drops, only the recipes and factories which use it
+# are queued to be looked at again.
+#
+# Items which no recipe produces, or which can't be made from items which
+# aren't, are raw and cost RAW_COST each. Costs can only ever go down, so the
+# relaxation always terminates with the cheapest costs, except around cycles
+# which make more of an item than they use (e.g. a compact recipe yielding more
+# than the matching decompact recipe takes). Those would get cheaper forever,
+# so after MAX_UPDATES improvements a cost is left as is and the plans are
+# marked as not converged.
+#
+# Item keys don't tell apart variants of a material (e.g. andesite and polished
+# andesite are both STONE), so some recipes look like they make more of an item
+# than they take, from nothing else. Those can't be costed, and are left out of
+# that item's costs. The plans are marked as not converged when there are any.
+
+# bump whenever plans made for the same config and weights would come out
+# differently, so cached plans are remade.
+VERSION = 2
+RAW_COST = 1.0
+# relative improvement below which a cost counts as unchanged
+TOLERANCE = 1e-9
+MAX_UPDATES = 1000
+
+
+class Choice(NamedTuple):
+    """
+    The cheapest way to make one unit of an item.
+    """
+
+    cost: float
+    factory: str
+    recipe: str
+    # item key -> amount used per unit made, including fuel
+    inputs: dict[str, float]
+    # factory time per unit made
+    seconds: float
+
+
+class FactoryChoice(NamedTuple):
+    """
+    The cheapest way to get a factory.
+    """
+
+    cost: float
+    # the factory upgraded from and the upgrade recipe, or None if it's
+    # cheapest to set the factory up directly.
+    upgraded_from: str | None
+    recipe: str | None
+    # item key -> amount spent on setup or on the upgrade
+    inputs: dict[str, float]
+
+
+class Plans:
+    """
+    The result of ``plan``: the cost and cheapest recipe of every item, and the
+    cost of every factory. Items and factories without an entry can't be made
+    from raw materials at all.
+    """
+
+    def __init__(
+        self, costs, choices, factories, *, converged=True, net_gains=(), key=None
+    ):
+        # item key -> cost per unit
+        self.costs = costs
+        # item key -> Choice, for items which aren't raw
+        self.choices = choices
+        # factory name -> FactoryChoice
+        self.factories = factories
+        self.converged = converged
+        # (factory name, recipe name, item key) of recipes left out of the cost
+        # of an item because they make more of it than they take.
+        self.net_gains = [tuple(net_gain) for net_gain in net_gains]
+        # identifies the config and weights these plans were made for, so
+        # cached plans can be checked for staleness.
+        self.key = key
+        self._raw_materials = {}
+        self._seconds = {}
+
+    def cost(self, item):
+        return self.costs.get(item, math.inf)
+
+    def _inputs(self, item):
+        # the cheapest recipe's inputs per unit of ``item``, with any of
+        # ``item`` it uses itself folded in. e.g. if making charcoal burns 1/8
+        # of a charcoal as fuel, one charcoal really takes 1 / (1 - 1/8) runs.
+        choice = self.choices.get(item)
+        if choice is None:
+            return ({}, 0)
+        reused = choice.inputs.get(item, 0)
+        scale = 1 / (1 - reused) if reused < 1 else 1
+        inputs = {k: v * scale for k, v in choice.inputs.items() if k != item}
+        return (inputs, choice.seconds * scale)
+
+    def raw_materials(self, item):
+        """
+        Mapping of raw item key to the amount of it needed for one unit of
+        ``item``, following the cheapest recipe all the way down.
+        """
+        if item not in self._raw_materials:
+            # placeholder, in case the choices are cyclic (only possible
+            # if the plans didn't converge).
+            self._raw_materials[item] = {item: 1.0}
+            if item in self.choices:
+                totals = {}
+                for input_item, amount in self._inputs(item)[0].items():
+                    for raw, raw_amount in self.raw_materials(input_item).items():
+                        totals[raw] = totals.get(raw, 0) + amount * raw_amount
+                self._raw_materials[item] = totals
+        return self._raw_materials[item]
+
+    def seconds(self, item):
+        """
+        Total factory time needed for one unit of ``item``, including the time
+        spent making its inputs.
+        """
+        if item not in self._seconds:
+            self._seconds[item] = 0
+            inputs, seconds = self._inputs(item)
+            self._seconds[item] = seconds + sum(
+                amount * self.seconds(input_item)
+                for input_item, amount in inputs.items()
+            )
+        return self._seconds[item]
+
+    def save(self, path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "key": self.key,
+            "converged": self.converged,
+            "net_gains": self.net_gains,
+            "costs": self.costs,
+            "choices": {k: v._asdict() for k, v in self.choices.items()},
+            "factories": {k: v._asdict() for k, v in self.factories.items()},
+        }
+        with open(path, "w") as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, path, key=None):
+        """
+        Plans saved to ``path``, or None if there aren't any or they were made
+        for something other than ``key``.
+        """
+        if not path.exists():
+            return None
+        with open(path) as f:
+            data = json.load(f)
+        if data["key"] != key:
+            return None
+        return cls(
+            data["costs"],
+            {k: Choice(**v) for k, v in data["choices"].items()},
+            {k: FactoryChoice(**v) for k, v in data["factories"].items()},
+            converged=data["converged"],
+            net_gains=data["net_gains"],
+            key=key,
+        )
+
+
+def _yields(recipe):
+    # item key -> expected amount made per run. Random outputs count by their
+    # chance.
+    yields = {}
+    for quantity in recipe.output or []:
+        key = item_key(quantity)
+        yields[key] = yields.get(key, 0) + quantity.amount
+    for output in recipe.outputs or []:
+        for quantity in output.quantities or []:
+            key = item_key(quantity)
+            yields[key] = yields.get(key, 0) + output.chance * quantity.amount
+    return {key: amount for key, amount in yields.items() if amount > 0}
+
+
+def _net_gains(recipe, yields):
+    # items which ``recipe`` makes more of than it takes. Fuel doesn't count:
+    # a recipe burning some of what it makes still makes it from its inputs.
+    inputs = {}
+    for quantity in recipe.input or []:
+        key = item_key(quantity)
+        inputs[key] = inputs.get(key, 0) + quantity.amount
+    return [item for item, amount in yields.items() if 0 < inputs.get(item, 0) < amount]
+
+
+def plan(config, *, time_weight=1.0, setup_runs=None, raw_costs=None, key=None):
+    """
+    Plan the cheapest way to make every item of ``config``.
+
+    ``time_weight`` is the cost of one second of factory time, in raw items.
+    Factory costs are reported separately by default. If ``setup_runs`` is
+    passed, each run of a recipe is also charged ``1 / setup_runs`` of what
+    its factory cost. ``raw_costs`` overrides the cost of specific items,
+    e.g. for items which are cheaper to get outside of factories.
+
+    ``config`` should be parsed with ``index=True``.
+    """
+    raw_costs = raw_costs or {}
+    index = getattr(config, "index", None)
+    if index is None:
+        index = ItemIndex()
+        for factory in config.factories:
+            index.add_factory(factory)
+
+    factories = {factory.name: factory for factory in config.factories}
+    fuels = list(dict.fromkeys(item_key(fuel) for fuel in config.default_fuel or []))
+    default_interval = config.default_fuel_consumption_intervall
+
+    costs = {}
+    for item in index.items():
+        if item in raw_costs:
+            costs[item] = raw_costs[item]
+        elif item not in index.produced_by:
+            costs[item] = RAW_COST
+    for item in fuels:
+        costs.setdefault(item, raw_costs.get(item, RAW_COST))
+    choices = {}
+    factory_choices = {}
+    updates = {}
+    converged = True
+    net_gains = []
+
+    def cost(item):
+        return costs.get(item, math.inf)
+
+    def recipe_inputs(recipe):
+        # item key -> amount used per run, including fuel
+        inputs = {}
+        for quantity in recipe.input or []:
+            key = item_key(quantity)
+            inputs[key] = inputs.get(key, 0) + quantity.amount
+        seconds = recipe.production_time.seconds if recipe.production_time else 0
+        interval = recipe.fuel_consumption_intervall or default_interval
+        if fuels and seconds and interval and interval.seconds:
+            fuel = min(fuels, key=cost)
+            inputs[fuel] = inputs.get(fuel, 0) + seconds / interval.seconds
+        return (inputs, seconds)
+
+    def run_cost(inputs, seconds):
+        return sum(amount * cost(item) for item, amount in inputs.items()) + (
+            time_weight * seconds
+        )
+
+    def improve(node):
+        # whether ``node`` may keep getting cheaper
+        nonlocal converged
+        updates[node] = updates.get(node, 0) + 1
+        if updates[node] > MAX_UPDATES:
+            converged = False
+            return False
+        return True
+
+    def cheaper(new, old):
+        return new < old and (math.isinf(old) or old - new > TOLERANCE * old)
+
+    # every relaxation is one of
+    #   ("produce", factory name, recipe, item key -> amount made per run)
+    #   ("setup", factory name, None, None)
+    #   ("upgrade", factory name, recipe, None)
+    edges = []
+    # item key or ("factory", name) -> indices of the edges to look at again
+    # when it gets cheaper
+    dependents = defaultdict(list)
+    for factory in config.factories:
+        dependents_of_factory = dependents[("factory", factory.name)]
+        # factories without a setup cost can only be upgraded to
+        if factory.setupcost:
+            for cost_item in factory.setupcost:
+                dependents[item_key(cost_item)].append(len(edges))
+            edges.append(("setup", factory.name, None, None))
+
+        for recipe in factory.recipes or []:
+            yields = None
+            if recipe.type is RecipeType.UPGRADE:
+                if recipe.factory not in factories:
+                    continue
+                kind = "upgrade"
+            else:
+                kind = "produce"
+                yields = _yields(recipe)
+                for item in _net_gains(recipe, yields):
+                    net_gains.append((factory.name, recipe.name, item))
+                    del yields[item]
+                if not yields:
+                    continue
+            if kind == "upgrade" or setup_runs:
+                dependents_of_factory.append(len(edges))
+            for item in recipe_inputs(recipe)[0]:
+                dependents[item].append(len(edges))
+            # the cheapest fuel may change, which can change any recipe
+            for fuel in fuels:
+                dependents[fuel].append(len(edges))
+            edges.append((kind, factory.name, recipe, yields))
+
+    queue = deque(range(len(edges)))
+    queued = set(queue)
+
+    def changed(node):
+        for i in dependents.get(node, []):
+            if i not in queued:
+                queued.add(i)
+                queue.append(i)
+
+    def relax():
+        while queue:
+            i = queue.popleft()
+            queued.discard(i)
+            kind, factory_name, recipe, yields = edges[i]
+
+            if kind == "setup":
+                setupcost = factories[factory_name].setupcost or []
+                inputs = {}
+                for cost_item in setupcost:
+                    inputs[item_key(cost_item)] = (
+                        inputs.get(item_key(cost_item), 0) + cost_item.amount
+                    )
+                new = run_cost(inputs, 0)
+                old = factory_choices.get(factory_name)
+                if cheaper(new, old.cost if old else math.inf):
+                    if improve(("factory", factory_name)):
+                        factory_choices[factory_name] = FactoryChoice(
+                            new, None, None, inputs
+                        )
+                        changed(("factory", factory_name))
+                continue
+
+            inputs, seconds = recipe_inputs(recipe)
+            base = run_cost(inputs, seconds)
+            if math.isinf(base):
+                continue
+
+            if kind == "upgrade":
+                source = factory_choices.get(factory_name)
+                if source is None:
+                    continue
+                new = source.cost + base
+                target = recipe.factory
+                old = factory_choices.get(target)
+                if cheaper(new, old.cost if old else math.inf):
+                    if improve(("factory", target)):
+                        factory_choices[target] = FactoryChoice(
+                            new, factory_name, recipe.name, inputs
+                        )
+                        changed(("factory", target))
+                continue
+
+            if setup_runs:
+                factory_choice = factory_choices.get(factory_name)
+                if factory_choice is None:
+                    continue
+                base += factory_choice.cost / setup_runs
+
+            for item, amount in yields.items():
+                new = base / amount
+                if not cheaper(new, cost(item)) or not improve(item):
+                    continue
+                costs[item] = new
+                choices[item] = Choice(
+                    new,
+                    factory_name,
+                    recipe.name,
+                    {k: v / amount for k, v in inputs.items()},
+                    seconds / amount,
+                )
+                changed(item)
+
+    relax()
+    # some items are only made from each other (e.g. civclassic's kinds of
+    # stone), so the relaxation can't reach them from raw materials. They can
+    # be found in the world as well, so treat them as raw too and carry on.
+    for item in index.items():
+        if item not in costs:
+            costs[item] = raw_costs.get(item, RAW_COST)
+            changed(item)
+    relax()
+
+    return Plans(
+        costs,
+        choices,
+        factory_choices,
+        converged=converged and not net_gains,
+        net_gains=net_gains,
+        key=key,
+    )
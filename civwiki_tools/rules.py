@@ -0,0 +1,241 @@
+import re
+from argparse import ArgumentParser
+
+import pywikibot
+import pywikibot.textlib
+
+from civwiki_tools.diff import Diff
+from civwiki_tools.dump import iter_pages
+
+# Declarative page transformations, and an engine which applies any number of
+# them to their pages in a single pass: one fetch and at most one save per
+# page, no matter how many rules touch it. Each rule only ever sees the pages
+# it was given.
+
+
+class Rule:
+    """
+    A transformation of page text. Subclasses implement ``apply``, which
+    returns ``(new_text, summary)``, with a summary of ``None`` if the rule
+    doesn't change the page.
+    """
+
+    def apply(self, text):
+        raise NotImplementedError
+
+
+class RegexSub(Rule):
+    def __init__(self, pattern, replacement):
+        self.pattern = pattern
+        self.replacement = replacement
+
+    def apply(self, text):
+        new_text = re.sub(self.pattern, self.replacement, text)
+        if new_text == text:
+            return (text, None)
+        return (new_text, f"regex edit: {self.pattern} -> {self.replacement}")
+
+
+class CategoryRewrite(Rule):
+    """
+    Replace categories with other categories. ``replacements`` maps a category
+    title to its replacement, or to None to remove it. Sort keys are kept,
+    including for replaced categories. Category links are parsed with the
+    namespaces of ``site``.
+    """
+
+    def __init__(self, replacements, *, site):
+        self.replacements = replacements
+        self.site = site
+
+    def apply(self, text):
+        categories = pywikibot.textlib.getCategoryLinks(text, self.site)
+        changed = [c.title() for c in categories if c.title() in self.replacements]
+        if not changed:
+            return (text, None)
+
+        new_categories = {}
+        for category in categories:
+            title = category.title()
+            if title in self.replacements:
+                title = self.replacements[title]
+                if title is None:
+                    continue
+                category = pywikibot.Category(
+                    self.site, title, sort_key=category.sortKey
+                )
+            # a page can only be in a category once. Keep the first link.
+            new_categories.setdefault(title, category)
+
+        new_text = pywikibot.textlib.replaceCategoryLinks(
+            text, list(new_categories.values()), site=self.site
+        )
+        return (new_text, f"recategorize {', '.join(f'[[:{c}]]' for c in changed)}")
+
+
+class TemplateRename(Rule):
+    """
+    Rename every transclusion of the template ``old`` to ``new``, keeping its
+    parameters.
+    """
+
+    def __init__(self, old, new):
+        self.old = old
+        self.new = new
+        # the first letter of a title is case insensitive, and spaces and
+        # underscores are interchangeable.
+        first, rest = old[0], old[1:]
+        name = f"[{first.upper()}{first.lower()}]" + r"[ _]+".join(
+            re.escape(part) for part in rest.split(" ")
+        )
+        self.pattern = re.compile(
+            rf"(\{{\{{\s*(?:[Tt]emplate\s*:\s*)?){name}(\s*[|}}])"
+        )
+
+    def apply(self, text):
+        new_text = self.pattern.sub(rf"\g<1>{self.new}\g<2>", text)
+        if new_text == text:
+            return (text, None)
+        return (new_text, f"rename template {self.old} -> {self.new}")
+
+
+class RuleEngine:
+    """
+    Applies rules to pages, reading through ``cache`` and recording progress
+    in ``journal``.
+
+    Pages come with the rules which apply to them, as a mapping of title to
+    list of rules (see ``targets``). Whether a page needs an edit at all is
+    decided from the cache. Pages which do are fetched once, have each of
+    their rules applied in order, and are saved once with the summaries of all
+    the rules which changed them.
+    """
+
+    def __init__(self, *, cache, journal, show_diff=False):
+        self.cache = cache
+        self.site = cache.site
+        self.journal = journal
+        self.show_diff = show_diff
+
+    def transform(self, text, rules):
+        summaries = []
+        for rule in rules:
+            text, summary = rule.apply(text)
+            if summary is not None:
+                summaries.append(summary)
+        return (text, summaries)
+
+    def dump_candidates(self, path, targets):
+        """
+        The part of ``targets`` which any of their rules would change, going
+        by their text in the MediaWiki XML dump at ``path``.
+        """
+        return {
+            entry.title: targets[entry.title]
+            for entry in iter_pages(path)
+            if entry.title in targets
+            and self.transform(entry.text or "", targets[entry.title])[1]
+        }
+
+    def run(self, targets):
+        titles = list(targets)
+        self.journal.plan(titles)
+        titles = [title for title in titles if not self.journal.is_done(title)]
+
+        self.cache.preload(titles)
+        for title in titles:
+            page = self.site.page(title)
+            print(f"Processing {page.full_url()}")
+            if self.apply(page, targets[title]):
+                self.journal.complete(title)
+
+    def apply(self, page, rules):
+        """
+        Apply ``rules`` to ``page``. Returns whether the page is finished
+        with, i.e. it was saved or didn't need an edit.
+        """
+        cached = self.cache.get(page.title())
+        if cached.revid is None:
+            print("  does not exist, skipping")
+            return True
+        # most pages don't need an edit, and we can tell that from the cache.
+        if not self.transform(cached.text, rules)[1]:
+            print("  no rules apply, skipping")
+            return True
+
+        old_text = page.text
+        new_text, summaries = self.transform(old_text, rules)
+        if not summaries:
+            # the page changed since the cache was synced
+            print("  no rules apply, skipping")
+            return True
+
+        summary = "; ".join(summaries)
+        diff = Diff(old_text, new_text)
+        print(f"  {summary}")
+        print(f"  diff: {diff.summary()}")
+        if self.show_diff:
+            print(diff.unified())
+
+        try:
+            page.text = new_text
+            page.save(summary)
+            self.cache.update(page)
+            print("  ...saved")
+            return True
+        except pywikibot.exceptions.Error as e:
+            print(f"  error saving changes: {e}")
+            return False
+
+
+def targets(sources):
+    """
+    Mapping of title to the rules which apply to it, from ``sources``: a list
+    of ``(rule, titles)`` pairs, where ``titles`` are the pages ``rule``
+    should be applied to. A page listed by several sources gets each of their
+    rules, in the order of ``sources``.
+    """
+    pages = {}
+    for rule, titles in sources:
+        for title in titles:
+            rules = pages.setdefault(title, [])
+            if rule not in rules:
+                rules.append(rule)
+    return pages
+
+
+def run_rules(name, sources, *, params=None):
+    """
+    The command line shared by the rule scripts. ``sources`` is a list of
+    ``(rule, titles)`` pairs, where ``titles()`` lists the pages ``rule``
+    should be applied to. Progress is journaled under ``name`` and
+    ``params``.
+    """
+    parser = ArgumentParser()
+    # a MediaWiki XML dump of the wiki (Special:Export). If passed, candidate
+    # pages are found by scanning the dump locally, and only those are fetched
+    # and edited.
+    parser.add_argument("--dump")
+    # skip pages already done by the last (interrupted) run
+    parser.add_argument("--resume", action="store_true", default=False)
+    # print the full diff of each edit, not just a summary
+    parser.add_argument("--diff", action="store_true", default=False)
+    args = parser.parse_args()
+
+    # these need the wiki (and accessing the site logs in), so only import
+    # them once we know we're doing something. The engine itself doesn't.
+    from civwiki_tools import site
+    from civwiki_tools.cache import PageCache
+    from civwiki_tools.journal import Journal
+
+    engine = RuleEngine(
+        cache=PageCache(site),
+        journal=Journal(name, params, resume=args.resume),
+        show_diff=args.diff,
+    )
+    pages = targets([(rule, titles()) for rule, titles in sources])
+    if args.dump:
+        pages = engine.dump_candidates(args.dump, pages)
+        print(f"found {len(pages)} candidate pages in {args.dump}")
+
+    engine.run(pages)
@@ -0,0 +1,116 @@
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from civwiki_tools.utils import relog
+
+# Where rendered pages go. Scripts hand every page which changed to a sink,
+# which either saves it to the wiki straight away or collects it to be
+# published or inspected later.
+
+
+class Sink:
+    def write(self, page, text):
+        """
+        Output ``text`` as the new text of ``page``.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class LiveSink(Sink):
+    """
+    Saves each page to the wiki as it comes, one edit per page.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def write(self, page, text):
+        page.text = text
+        while True:
+            try:
+                page.save()
+                break
+            except Exception as e:
+                print(f"ignoring exception {e}. Relogging...")
+                relog()
+        # outside the retries: the page is saved by now, and saving it again
+        # because refreshing the cache failed would be a second edit.
+        self.cache.update(page)
+
+
+class DirectorySink(Sink):
+    """
+    Writes each page to ``<path>/<title>.wiki``, e.g. to diff against a
+    previous run.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def write(self, page, text):
+        # characters which aren't allowed in file names on some platforms
+        name = re.sub(r'[\\/:*?"<>|]', "_", page.title())
+        (self.path / f"{name}.wiki").write_text(text, encoding="utf-8")
+
+
+class XMLImportSink(Sink):
+    """
+    Streams every page into a single MediaWiki XML export file at ``path``,
+    which can be imported in bulk with Special:Import or importDump.php rather
+    than saved one edit at a time.
+    """
+
+    def __init__(self, path, *, username=None, comment=None):
+        self.username = username
+        self.comment = comment
+        self.file = open(path, "w", encoding="utf-8")
+        self.file.write(
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.11/" '
+            'version="0.11" xml:lang="en">\n'
+        )
+
+    def write(self, page, text):
+        timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        contributor = ""
+        if self.username is not None:
+            contributor = (
+                "      <contributor>\n"
+                f"        <username>{escape(self.username)}</username>\n"
+                "      </contributor>\n"
+            )
+        comment = ""
+        if self.comment is not None:
+            comment = f"      <comment>{escape(self.comment)}</comment>\n"
+
+        self.file.write(
+            "  <page>\n"
+            f"    <title>{escape(page.title())}</title>\n"
+            f"    <ns>{page.namespace().id}</ns>\n"
+            "    <revision>\n"
+            f"      <timestamp>{timestamp}</timestamp>\n"
+            f"{contributor}"
+            f"{comment}"
+            "      <model>wikitext</model>\n"
+            "      <format>text/x-wiki</format>\n"
+            f'      <text xml:space="preserve" bytes="{len(text.encode())}">'
+            f"{escape(text)}</text>\n"
+            "    </revision>\n"
+            "  </page>\n"
+        )
+
+    def close(self):
+        self.file.write("</mediawiki>\n")
+        self.file.close()
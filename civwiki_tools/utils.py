@@ -1,19 +1,36 @@
+from functools import cache
 from pathlib import Path
 
-from pywikibot import Site as _Site
-from pywikibot.config import family_files
+RESOURCES = Path(__file__).parent.parent / "resources"
+# local state which persists between script runs, like the page cache.
+CACHE = Path(__file__).parent.parent / "cache"
 
-from civwiki_tools import family
-from civwiki_tools.site import Site
 
-# register our family
-family_name = family.CivwikiFamily.name
-family_files[family_name] = family.__file__
-site: Site = _Site("en", family_name, interface=Site)
+@cache
+def _site():
+    # pywikibot checks for a login cookie with the wiki as soon as a site is
+    # created, so only create ours when something actually needs it. Modules
+    # which only need the paths above (the cache, the journal, the sinks)
+    # then work offline.
+    from pywikibot import Site as _Site
+    from pywikibot.config import family_files
 
-RESOURCES = Path(__file__).parent.parent / "resources"
+    from civwiki_tools import family
+    from civwiki_tools.site import Site
+
+    # register our family
+    family_name = family.CivwikiFamily.name
+    family_files[family_name] = family.__file__
+    return _Site("en", family_name, interface=Site)
+
+
+def __getattr__(name):
+    if name != "site":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return _site()
 
 
 def relog():
+    site = _site()
     del site.userinfo
     del site.tokens
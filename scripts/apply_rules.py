@@ -0,0 +1,26 @@
+# runs the category merge of merge_civlization_categories.py and the regex edit
+# of regex_edit_backlinks.py together, in a single pass. A page which needs
+# both changes is fetched once and saved once.
+#
+# example usage:
+# python3 scripts/apply_rules.py
+# python3 scripts/apply_rules.py --dump civwiki-current.xml --resume
+
+from civwiki_tools.rules import RegexSub, run_rules
+from merge_civlization_categories import (
+    CivilizationCategoryMerge,
+    civilization_titles,
+)
+from regex_edit_backlinks import backlink_titles, page, pattern, replacement
+
+if __name__ == "__main__":
+    # each rule only applies to the pages from its own source, as when running
+    # the scripts separately. A page from both sources gets both rules.
+    run_rules(
+        "apply_rules",
+        [
+            (CivilizationCategoryMerge(), civilization_titles),
+            (RegexSub(pattern, replacement), lambda: backlink_titles(page)),
+        ],
+        params={"page": page, "pattern": pattern, "replacement": replacement},
+    )
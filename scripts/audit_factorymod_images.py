@@ -0,0 +1,75 @@
+# finds images linked from the rendered FactoryMod templates which don't exist
+# on the wiki, and writes them to a work queue for batch.py / import_item_image.py.
+#
+# example usage:
+# python3 scripts/audit_factorymod_images.py
+# python3 scripts/audit_factorymod_images.py --server civmc --output input.txt
+# python3 batch.py
+
+import re
+from argparse import ArgumentParser
+from collections import defaultdict
+
+import yaml
+
+from civwiki_tools import site
+from civwiki_tools.cache import PageCache
+from civwiki_tools.factorymod import parse_factorymod
+from update_factorymod import FactoryModPrinter, config_files
+
+file_link = re.compile(r"\[\[(File:[^|\]]+)")
+redirect = re.compile(r"\s*#REDIRECT", re.IGNORECASE)
+
+
+def referenced_files(servers):
+    """
+    Mapping of every file title linked from a rendered template of
+    ``servers`` to the factories which link it, as (server, factory name).
+    """
+    files = defaultdict(set)
+    for server in servers:
+        with open(config_files[server]) as f:
+            config = parse_factorymod(yaml.safe_load(f))
+        for factory in config.factories:
+            text = FactoryModPrinter(config, factory).get_value()
+            for title in file_link.findall(text):
+                files[title].add((server, factory.name))
+    return files
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--server", choices=list(config_files), default=None)
+    # one item name per line, which is what batch.py reads
+    parser.add_argument("--output", default="input.txt")
+    args = parser.parse_args()
+
+    servers = [args.server] if args.server else list(config_files)
+    files = referenced_files(servers)
+    print(f"found {len(files)} distinct files linked from {servers}")
+
+    # file pages are looked up many per request, and stay cached until they
+    # show up in recent changes (e.g. when someone uploads a missing one).
+    cache = PageCache(site)
+    titles = sorted(files)
+    cache.preload(titles)
+
+    missing = []
+    for title in titles:
+        cached = cache.get(title)
+        if cached.revid is None:
+            missing.append(title)
+        elif redirect.match(cached.text):
+            print(f"{title} is a redirect")
+
+    for title in missing:
+        used_by = ", ".join(
+            f"{name} ({server})" for server, name in sorted(files[title])
+        )
+        print(f"{title} is missing. Used by {used_by}")
+
+    # File:Oak Log.png -> Oak Log
+    names = [title.removeprefix("File:").removesuffix(".png") for title in missing]
+    with open(args.output, "w") as f:
+        f.writelines(f"{name}\n" for name in names)
+    print(f"wrote {len(names)} missing images to {args.output}")
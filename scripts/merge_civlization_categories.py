@@ -1,10 +1,9 @@
-import difflib
-
 import pywikibot
 import pywikibot.textlib
 from pywikibot import Category
 
 from civwiki_tools import site
+from civwiki_tools.rules import Rule, run_rules
 
 # takes a page with e.g.
 #   [[Category:CivMC]]
@@ -35,62 +34,64 @@ replacements = {
 }
 
 
-def merge_categories():
+def plan_merge(categories):
+    """
+    Work out the new category list for a page currently in ``categories``.
+
+    Returns ``(new_categories, found, reason)``. ``reason`` is None if the page
+    should be edited, and otherwise explains why it should be skipped.
+    """
     civ_category_title = civ_category.title()
-    for page in civ_category.articles():
-        print(f"Processing {page.full_url()}")
-        if not page.exists():
-            print("  does not exist, skipping")
+    new_categories = categories.copy()
+    found = None
+    for server_category, new_civ_category in replacements.items():
+        if server_category not in categories:
             continue
+        if new_civ_category in categories:
+            return (None, None, f"already has category {new_civ_category}")
+        if found is not None:
+            return (None, None, f"found multiple server categories in {categories}")
+        found = {"server_cat": server_category, "new_civ_cat": new_civ_category}
 
-        categories = [c.title() for c in pywikibot.textlib.getCategoryLinks(page.text)]
-        new_categories = categories.copy()
-        found = None
-        skip = False
-        for server_category, new_civ_category in replacements.items():
-            if server_category not in categories:
-                continue
-            if new_civ_category in categories:
-                skip = True
-                print(f"  already has category {new_civ_category}, skipping")
-                break
-            if found is not None:
-                print(f"  found multiple server categories in {categories}, skipping")
-                skip = True
-                break
-            found = {"server_cat": server_category, "new_civ_cat": new_civ_category}
-
-            # not always explicitly present. it might be transcluded from a template.
-            if civ_category_title in new_categories:
-                new_categories.remove(civ_category_title)
-            new_categories.remove(server_category)
-            new_categories.append(new_civ_category)
-
-        if skip:
-            continue
-        if found is None:
-            print(f"  no matching server category in {categories}, skipping")
-            continue
+        # not always explicitly present. it might be transcluded from a template.
+        if civ_category_title in new_categories:
+            new_categories.remove(civ_category_title)
+        new_categories.remove(server_category)
+        new_categories.append(new_civ_category)
+
+    if found is None:
+        return (None, None, f"no matching server category in {categories}")
+    return (new_categories, found, None)
 
-        old_text = page.text
-        page.text = pywikibot.textlib.replaceCategoryLinks(old_text, new_categories)
+
+def page_categories(text):
+    return [c.title() for c in pywikibot.textlib.getCategoryLinks(text, site)]
+
+
+class CivilizationCategoryMerge(Rule):
+    def apply(self, text):
+        new_categories, found, reason = plan_merge(page_categories(text))
+        if reason is not None:
+            return (text, None)
 
         summary = (
-            f"Merging categories [[{civ_category_title}]] + [[{found["server_cat"]}]] "
-            f"-> [[{found["new_civ_cat"]}]]"
+            f"Merging categories [[{civ_category.title()}]] + "
+            f"[[{found["server_cat"]}]] -> [[{found["new_civ_cat"]}]]"
         )
-        diff = "\n".join(
-            difflib.unified_diff(old_text.split("\n"), page.text.split("\n"))
+        new_text = pywikibot.textlib.replaceCategoryLinks(
+            text, new_categories, site=site
         )
-        print(f"  {summary}")
-        print(f"  diff: {diff}")
+        return (new_text, summary)
+
 
-        try:
-            print("  saving changes...")
-            page.save(summary)
-            print("  ...saved")
-        except pywikibot.exceptions.Error as e:
-            print(f"  error saving changes: {e}")
+def civilization_titles():
+    # listing category members is cheap (titles only, hundreds per request).
+    # It's fetching each page's text that we want to avoid.
+    return [page.title() for page in civ_category.articles()]
 
 
-merge_categories()
+if __name__ == "__main__":
+    run_rules(
+        "merge_civlization_categories",
+        [(CivilizationCategoryMerge(), civilization_titles)],
+    )
@@ -2,21 +2,29 @@
 # python3 scripts/update_factorymod.py --server "civclassic 2.0" --factory all
 # python3 scripts/update_factorymod.py --server "civclassic 2.0" --factory "Ore Smelter"
 # python3 scripts/update_factorymod.py --server "civmc" --factory all --dry
+# python3 scripts/update_factorymod.py --server "civmc" --factory all --dry --diff
+# python3 scripts/update_factorymod.py --server "civmc" --factory all --resume
+# python3 scripts/update_factorymod.py --server "civmc" --factory all --sink xml --output civmc.xml
+# python3 scripts/update_factorymod.py --server "civmc" --factory all --sink directory --output out
 
 from argparse import ArgumentParser
 from typing import Any
 
 import yaml
 
-from civwiki_tools import site
+from civwiki_tools.cache import PageCache
+from civwiki_tools.diff import Diff
 from civwiki_tools.factorymod import (
     Config,
     Factory,
     Quantity,
     RecipeType,
+    item_key,
     parse_factorymod,
 )
-from civwiki_tools.utils import RESOURCES, relog
+from civwiki_tools.journal import Journal
+from civwiki_tools.sinks import DirectorySink, LiveSink, XMLImportSink
+from civwiki_tools.utils import RESOURCES
 
 config_files = {
     "civcraft 3.0": RESOURCES / "civcraft 3.0.yaml",
@@ -64,6 +72,40 @@ def float_to_string(val):
     return f"{v:.12f}".rstrip("0").rstrip(".")
 
 
+def item_name(key):
+    # the name of the item's image. Item usage templates are named after it
+    # too, so e.g. CHARCOAL (civmc) and charcoal (a custom key) share a page.
+    name = key.replace("_", " ").title()
+    return item_mappings.get(name, name)
+
+
+def image(key, *, hover_text: str | None = None):
+    name = item_name(key)
+    if hover_text:
+        return f"[[File:{name}.png|23px|middle|{hover_text}]]"
+
+    return f"[[File:{name}.png|23px|middle]]"
+
+
+def quantity_cell(quantities: list[Any]):
+    parts = []
+    for quantity in quantities:
+        hover_text = (
+            ", ".join(
+                f"{e.enchant.replace('_', ' ').title()} {e.level}"
+                for e in quantity.enchantments
+            )
+            if isinstance(quantity, Quantity) and quantity.enchantments
+            else None
+        )
+
+        parts.append(
+            f"{quantity.amount} {image(item_key(quantity), hover_text=hover_text)}"
+        )
+
+    return ", ".join(parts)
+
+
 class FactoryModPrinter:
     def __init__(self, config: Config, factory: Factory):
         self.config = config
@@ -90,45 +132,16 @@ class FactoryModPrinter:
 
         return self.output
 
-    def image(self, item_name, *, hover_text: str | None = None):
-        item_name = item_name.replace("_", " ").title()
-        if item_name in item_mappings:
-            item_name = item_mappings[item_name]
-
-        if hover_text:
-            return f"[[File:{item_name}.png|23px|middle|{hover_text}]]"
-
-        return f"[[File:{item_name}.png|23px|middle]]"
-
-    def quantity_cell(self, quantities: list[Any]):
-        parts = []
-        for quantity in quantities:
-            item_name = quantity.custom_key or quantity.type or quantity.material
-            hover_text = (
-                ", ".join(
-                    f"{e.enchant.replace('_', ' ').title()} {e.level}"
-                    for e in quantity.enchantments
-                )
-                if isinstance(quantity, Quantity) and quantity.enchantments
-                else None
-            )
-
-            parts.append(
-                f"{quantity.amount} {self.image(item_name, hover_text=hover_text)}"
-            )
-
-        return ", ".join(parts)
-
     def recipe_quantity_cell(self, recipe, type):
         if type == "input":
             if recipe.input:
-                return self.quantity_cell(recipe.input)
+                return quantity_cell(recipe.input)
             else:
                 # TODO: "decompact"
                 return "TODO"
         if type == "output":
             if recipe.output:
-                return self.quantity_cell(recipe.output)
+                return quantity_cell(recipe.output)
             elif recipe.outputs:
                 self.random_recipes.append(recipe)
                 # we'll create this anchor when we create the table for this recipe
@@ -149,7 +162,7 @@ class FactoryModPrinter:
         # TODO support displaying multiple default fuels, by cycling through them
         # in a gif. look at how minecraft.wiki does variable recipes
         fuel = self.config.default_fuel[0]
-        return f"{cost} {self.image(fuel.type or fuel.material)}"
+        return f"{cost} {image(fuel.type or fuel.material)}"
 
     def repair_recipes(self):
         repair_recipes = [
@@ -225,7 +238,7 @@ class FactoryModPrinter:
             |+
             ! colspan="4" |Creation Cost
             |-
-            | colspan="4" {f"|{self.quantity_cell(self.factory.setupcost)}" if self.factory.setupcost else "{{n/a}}"}
+            | colspan="4" {f"|{quantity_cell(self.factory.setupcost)}" if self.factory.setupcost else "{{n/a}}"}
             |-
             ! colspan="4" |Repair Cost
             |-
@@ -257,7 +270,7 @@ class FactoryModPrinter:
             f"""
             |-
             |{float_to_string(random_output.chance * 100)}%
-            |{self.quantity_cell(random_output.quantities)}"""
+            |{quantity_cell(random_output.quantities)}"""
             for random_output in sorted(
                 recipe.outputs, key=lambda output: -output.chance
             )
@@ -280,21 +293,28 @@ class FactoryModPrinter:
         return "\n\n".join(tables)
 
 
-def update_factory(config, factory, *, confirm=False, dry=False):
-    printer = FactoryModPrinter(config, factory)
-    new_text = printer.get_value()
-
+def wiki_server_name(server):
     # --server may be passed as e.g. civclassic 2.0, but the template page
     # exists at CivClassic 2.0.
-    wiki_server_name = args.server
     for k, v in wiki_server_names.items():
-        wiki_server_name = wiki_server_name.replace(k, v)
+        server = server.replace(k, v)
+    return server
+
+
+def factory_title(factory):
+    return page_title.format(factory=factory.name, server=wiki_server_name(args.server))
 
-    title = page_title.format(factory=factory.name, server=wiki_server_name)
-    page = site.page(title)
+
+def update_page(
+    title, new_text, *, cache, sink=None, confirm=False, dry=False, show_diff=False
+):
+    # save straight to the wiki unless told otherwise
+    sink = sink or LiveSink(cache)
+    page = cache.site.page(title)
     title = page.title()
 
-    if page.text == new_text:
+    diff = Diff(cache.text(title), new_text)
+    if not diff.changed:
         print(f"Nothing has changed for {title}. Skipping update")
         return
 
@@ -304,28 +324,85 @@ def update_factory(config, factory, *, confirm=False, dry=False):
             print(f"skipped {title}")
             return
 
-    page.text = new_text
-
     if dry:
-        print(page.text)
+        print(f"{title}: {diff.summary()}")
+        if show_diff:
+            print(diff.unified())
         return
 
-    while True:
-        try:
-            page.save()
-            return
-        except Exception as e:
-            print(f"ignoring exception {e}. Relogging...")
-            relog()
+    sink.write(page, new_text)
 
 
-if __name__ == "__main__":
+def template_parser():
+    """
+    An ArgumentParser with the options shared by the scripts which render
+    templates. Their pages are then updated by ``update_pages``.
+    """
     parser = ArgumentParser()
+    parser.add_argument("--dry", action="store_true", default=False)
+    # with --dry, print the full diff of each template, not just a summary
+    parser.add_argument("--diff", action="store_true", default=False)
+    # skip templates already done by the last (interrupted) run
+    parser.add_argument("--resume", action="store_true", default=False)
+    return parser
+
+
+def update_pages(name, params, pages, *, args, sink=None):
+    """
+    Update each of ``pages``, a mapping of title to a function rendering its
+    new text, as asked by ``args`` (see ``template_parser``). Progress is
+    journaled under ``name`` and ``params``. Pages go to ``sink``, or straight
+    to the wiki if not passed.
+    """
+    # logs in to the wiki, so not until we know we're doing something
+    from civwiki_tools import site
+
+    # dry runs get their own journal, so they never mark real work as done
+    journal = Journal(f"{name}-dry" if args.dry else name, params, resume=args.resume)
+    journal.plan(list(pages))
+    titles = [title for title in pages if not journal.is_done(title)]
+
+    cache = PageCache(site)
+    cache.preload(titles)
+    sink = sink or LiveSink(cache)
+    with sink:
+        for title in titles:
+            update_page(
+                title,
+                pages[title](),
+                cache=cache,
+                sink=sink,
+                dry=args.dry,
+                show_diff=args.diff,
+            )
+            # live saves retry until they go through, so returning always
+            # means this page is done.
+            journal.complete(title)
+
+
+if __name__ == "__main__":
+    parser = template_parser()
     parser.add_argument("--server", required=True)
     parser.add_argument("--factory", required=True)
-    parser.add_argument("--dry", action="store_true", default=False)
+    # where changed templates go: saved to the wiki one edit at a time
+    # (live), written to a directory of .wiki files, or bundled into a single
+    # XML file for Special:Import / importDump.php.
+    parser.add_argument("--sink", choices=["live", "directory", "xml"], default="live")
+    # the directory or file to write to, for --sink directory / xml
+    parser.add_argument("--output", default=None)
     args = parser.parse_args()
 
+    if args.sink != "live" and args.output is None:
+        parser.error(f"--sink {args.sink} requires --output")
+    # dry runs don't write anything, and opening the output would already
+    # overwrite whatever is there.
+    if args.sink != "live" and args.dry:
+        parser.error("--dry only applies to --sink live")
+    # each run writes its output from scratch, so skipping pages a previous
+    # run already wrote would leave them out.
+    if args.sink != "live" and args.resume:
+        parser.error("--resume only applies to --sink live")
+
     if args.server not in config_files:
         raise ValueError(
             f"invalid server {args.server}. Expected one of "
@@ -336,16 +413,41 @@ if __name__ == "__main__":
     with open(config_file) as f:
         data = yaml.safe_load(f)
 
-    config = parse_factorymod(data)
     if args.factory == "all":
+        config = parse_factorymod(data)
         factories = config.factories
     else:
+        # only parse what's needed for this one factory. This also includes the
+        # factories it upgrades to and from, so filter those back out.
+        config = parse_factorymod(data, factory=args.factory)
         factories = [f for f in config.factories if f.name == args.factory]
-        if not factories:
-            raise ValueError(
-                f"no factory named {args.factory}. Expected one of "
-                f"{[f.name for f in config.factories]}"
-            )
 
-    for factory in factories:
-        update_factory(config, factory, dry=args.dry)
+    name = "update_factorymod"
+    sink = None
+    if args.sink == "directory":
+        sink = DirectorySink(args.output)
+    elif args.sink == "xml":
+        from civwiki_tools import site
+
+        sink = XMLImportSink(
+            args.output,
+            username=site.username(),
+            comment=f"Update FactoryMod templates for {args.server}",
+        )
+    # runs which don't save to the wiki get their own journal, so they never
+    # mark real work as done
+    if sink is not None:
+        name += f"-{args.sink}"
+
+    update_pages(
+        name,
+        {"server": args.server, "factory": args.factory},
+        {
+            factory_title(factory): (
+                lambda factory=factory: FactoryModPrinter(config, factory).get_value()
+            )
+            for factory in factories
+        },
+        args=args,
+        sink=sink,
+    )
@@ -0,0 +1,167 @@
+# renders a "Produced by / Used in" template for items in the factorymod
+# configs of every server, at Template:FactoryModUsage_<Item>.
+#
+# example usage:
+# python3 scripts/update_item_usage.py --item all
+# python3 scripts/update_item_usage.py --item "Meteoric Iron Ingot" --dry --diff
+
+from collections import defaultdict
+
+import yaml
+
+from civwiki_tools.factorymod import RecipeType, item_key, parse_factorymod
+from update_factorymod import (
+    config_files,
+    float_to_string,
+    item_name,
+    quantity_cell,
+    template_parser,
+    update_pages,
+    wiki_server_name,
+)
+
+page_title = "Template:FactoryModUsage_{item}"
+
+
+class ItemUsagePrinter:
+    def __init__(self, usages):
+        # these tables mix factories from several servers, so there's no
+        # single config or factory.
+        # list[(server, Config, item key)]
+        self.usages = usages
+        self.output = ""
+
+    def write(self, text):
+        self.output += text
+
+    def get_value(self):
+        self.write(self.usage_table("Produced by", "produced_by"))
+        self.write("\n\n")
+        self.write(self.usage_table("Used in", "consumed_by"))
+        self.write("\n\n")
+        self.write(self.setup_table())
+        return self.output
+
+    def input_cell(self, recipe):
+        if not recipe.input:
+            return "{{n/a}}"
+        return quantity_cell(recipe.input)
+
+    def output_cell(self, recipe, key=None):
+        if recipe.type is RecipeType.UPGRADE:
+            return f"Upgrade to {recipe.factory}"
+        if recipe.type is RecipeType.REPAIR:
+            return f"{recipe.health_gained} health"
+        if recipe.output:
+            return quantity_cell(recipe.output)
+        if recipe.outputs:
+            # random recipes can have dozens of outcomes. If we're showing how
+            # an item is produced, only show the ones with that item.
+            return "<br>".join(
+                f"{float_to_string(output.chance * 100)}%: "
+                f"{quantity_cell(output.quantities)}"
+                for output in sorted(recipe.outputs, key=lambda output: -output.chance)
+                if key is None or any(item_key(q) == key for q in output.quantities)
+            )
+        return "{{n/a}}"
+
+    def usage_rows(self, attr):
+        rows = []
+        for server, config, key in self.usages:
+            # the item itself is the input of every "Used in" recipe
+            output_key = key if attr == "produced_by" else None
+            for factory, recipe in getattr(config.index, attr).get(key, []):
+                rows.append(f"""
+            |-
+            |{wiki_server_name(server)}
+            |{factory.name}
+            |{recipe.name}
+            |{self.input_cell(recipe)}
+            |{self.output_cell(recipe, output_key)}
+            |{recipe.production_time}""")
+        if not rows:
+            return """
+            |-
+            | colspan="6" {{n/a}}"""
+        return "".join(rows)
+
+    def usage_table(self, caption, attr):
+        return f"""
+            {{| class="wikitable"
+            |+{caption}
+            !Server
+            !Factory
+            !Recipe
+            !Input
+            !Output
+            !Time
+            {self.usage_rows(attr)}
+            |}}
+        """.strip()
+
+    def setup_rows(self):
+        rows = []
+        for server, config, key in self.usages:
+            for factory in config.index.setup_for.get(key, []):
+                rows.append(f"""
+            |-
+            |{wiki_server_name(server)}
+            |{factory.name}
+            |{quantity_cell(factory.setupcost)}""")
+        if not rows:
+            return """
+            |-
+            | colspan="3" {{n/a}}"""
+        return "".join(rows)
+
+    def setup_table(self):
+        return f"""
+            {{| class="wikitable"
+            |+Used to create
+            !Server
+            !Factory
+            !Creation Cost
+            {self.setup_rows()}
+            |}}
+        """.strip()
+
+
+def item_usages():
+    """
+    Mapping of item name to list[(server, Config, item key)] over the configs
+    of every server. Each config is indexed once, so this is a single pass
+    over every recipe and factory.
+    """
+    usages = defaultdict(list)
+    for server, path in config_files.items():
+        with open(path) as f:
+            config = parse_factorymod(yaml.safe_load(f), index=True)
+        for key in config.index.items():
+            usages[item_name(key)].append((server, config, key))
+    return usages
+
+
+if __name__ == "__main__":
+    parser = template_parser()
+    parser.add_argument("--item", required=True)
+    args = parser.parse_args()
+
+    usages = item_usages()
+    if args.item == "all":
+        names = sorted(usages)
+    elif args.item in usages:
+        names = [args.item]
+    else:
+        raise ValueError(f"no item named {args.item}. Expected one of {sorted(usages)}")
+
+    update_pages(
+        "update_item_usage",
+        {"item": args.item},
+        {
+            page_title.format(item=name): (
+                lambda name=name: ItemUsagePrinter(usages[name]).get_value()
+            )
+            for name in names
+        },
+        args=args,
+    )
@@ -0,0 +1,163 @@
+# renders the cheapest way to make every item of a server's factorymod config
+# from raw materials, at Template:FactoryModPlans_(<Server>).
+#
+# example usage:
+# python3 scripts/update_production_plans.py --server civmc
+# python3 scripts/update_production_plans.py --server civmc --dry --diff
+# python3 scripts/update_production_plans.py --server civmc --setup-runs 1000
+
+import hashlib
+import json
+
+import yaml
+
+from civwiki_tools.factorymod import parse_factorymod
+from civwiki_tools.planner import VERSION, Plans, plan
+from civwiki_tools.utils import CACHE
+from update_factorymod import (
+    config_files,
+    float_to_string,
+    image,
+    item_name,
+    template_parser,
+    update_pages,
+    wiki_server_name,
+)
+
+page_title = "Template:FactoryModPlans_({server})"
+
+
+class PlansPrinter:
+    def __init__(self, plans):
+        self.plans = plans
+        self.output = ""
+
+    def write(self, text):
+        self.output += text
+
+    def get_value(self):
+        self.write(self.items_table())
+        self.write("\n\n")
+        self.write(self.factories_table())
+        return self.output
+
+    def amounts_cell(self, amounts):
+        if not amounts:
+            return "{{n/a}}"
+        return ", ".join(
+            f"{float_to_string(amount)} {image(item)}"
+            for item, amount in sorted(amounts.items(), key=lambda kv: -kv[1])
+        )
+
+    def cost_cell(self, cost):
+        # costs run into the tens of thousands, where float_to_string shows
+        # float noise
+        return f"{cost:.2f}"
+
+    def seconds_cell(self, item):
+        seconds = self.plans.seconds(item)
+        return float_to_string(seconds) if seconds else "{{n/a}}"
+
+    def item_rows(self):
+        return "".join(
+            f"""
+            |-
+            |{image(item)} {item_name(item)}
+            |{self.cost_cell(choice.cost)}
+            |{choice.factory}
+            |{choice.recipe}
+            |{self.amounts_cell(self.plans.raw_materials(item))}
+            |{self.seconds_cell(item)}"""
+            for item, choice in sorted(
+                self.plans.choices.items(), key=lambda kv: item_name(kv[0])
+            )
+        )
+
+    def items_table(self):
+        return f"""
+            {{| class="wikitable sortable"
+            |+Cheapest production, per item
+            !Item
+            !Cost
+            !Factory
+            !Recipe
+            !Raw Materials
+            !Time
+            {self.item_rows()}
+            |}}
+        """.strip()
+
+    def factory_rows(self):
+        rows = []
+        for name, choice in sorted(self.plans.factories.items()):
+            if choice.upgraded_from is None:
+                via = "Setup"
+            else:
+                via = f"{choice.recipe} (from {choice.upgraded_from})"
+            rows.append(f"""
+            |-
+            |{name}
+            |{self.cost_cell(choice.cost)}
+            |{via}
+            |{self.amounts_cell(choice.inputs)}""")
+        return "".join(rows)
+
+    def factories_table(self):
+        return f"""
+            {{| class="wikitable sortable"
+            |+Cheapest way to get each factory
+            !Factory
+            !Cost
+            !Via
+            !Spent
+            {self.factory_rows()}
+            |}}
+        """.strip()
+
+
+def server_plans(server, **weights):
+    """
+    Plans for ``server``, from the cache if they were made for the same config
+    and weights.
+    """
+    config_file = config_files[server]
+    with open(config_file, "rb") as f:
+        raw = f.read()
+    # the planner version too, so plans made by an older planner are remade
+    key = hashlib.sha256(raw + json.dumps([VERSION, weights]).encode()).hexdigest()
+    path = CACHE / "plans" / f"{server}.json"
+
+    plans = Plans.load(path, key)
+    if plans is None:
+        config = parse_factorymod(yaml.safe_load(raw), index=True)
+        plans = plan(config, key=key, **weights)
+        plans.save(path)
+    return plans
+
+
+if __name__ == "__main__":
+    parser = template_parser()
+    parser.add_argument("--server", choices=list(config_files), required=True)
+    # cost of one second of factory time, in raw items
+    parser.add_argument("--time-weight", type=float, default=1.0)
+    # charge each recipe run 1/N of what its factory cost
+    parser.add_argument("--setup-runs", type=int, default=None)
+    args = parser.parse_args()
+
+    weights = {"time_weight": args.time_weight, "setup_runs": args.setup_runs}
+    plans = server_plans(args.server, **weights)
+    if not plans.converged:
+        print(
+            "warning: some recipes or recipe cycles make more than they use, so "
+            "the costs of some items are only approximate"
+        )
+    for factory, recipe, item in plans.net_gains:
+        print(f"  {recipe} ({factory}) makes more {item} than it takes")
+
+    title = page_title.format(server=wiki_server_name(args.server))
+    update_pages(
+        "update_production_plans",
+        {"server": args.server, **weights},
+        {title: lambda: PlansPrinter(plans).get_value()},
+        args=args,
+    )
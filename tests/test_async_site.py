@@ -0,0 +1,185 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from pywikibot.exceptions import APIError
+
+from civwiki_tools.async_site import AsyncSite
+
+# AsyncSite against a local stand-in for the wiki's api.
+
+MEMBERS = [f"Page {i}" for i in range(25)]
+BACKLINKS = ["Linker A", "Linker B"]
+
+
+class StandIn:
+    """
+    Serves just enough of api.php for AsyncSite: paged list queries, page
+    contents (pages starting with "Missing" don't exist, and those starting
+    with "Hidden" have their text hidden), and an error for any title starting
+    with "Bad". Records the requests it sees.
+
+    If ``contents_size`` is passed, at most that many page contents fit in one
+    response, and the rest of a batch comes in continuations.
+    """
+
+    def __init__(self, *, page_size=10, delay=0.01, contents_size=None):
+        self.page_size = page_size
+        self.delay = delay
+        self.contents_size = contents_size
+        self.batches = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def list_response(self, list_name, items, params, continue_key):
+        start = int(params.get(continue_key, 0))
+        end = start + self.page_size
+        data = {"query": {list_name: [{"title": title} for title in items[start:end]]}}
+        if end < len(items):
+            data["continue"] = {continue_key: str(end), "continue": "-||"}
+        return data
+
+    def pages_response(self, titles, params):
+        start = int(params.get("rvcontinue", 0))
+        if start == 0:
+            self.batches.append(titles)
+        if any(title.startswith("Bad") for title in titles):
+            return {"error": {"code": "invalidtitle", "info": "Bad title"}}
+        end = len(titles)
+        if self.contents_size is not None:
+            end = min(end, start + self.contents_size)
+
+        pages = []
+        for i, title in enumerate(titles):
+            if title.startswith("Missing"):
+                pages.append({"title": title, "missing": True})
+            elif not start <= i < end:
+                # like MediaWiki, pages whose contents didn't fit (or came in
+                # an earlier response) are listed without revisions
+                pages.append({"title": title})
+            elif title.startswith("Hidden"):
+                slots = {"main": {"texthidden": True}}
+                pages.append({"title": title, "revisions": [{"slots": slots}]})
+            else:
+                slots = {"main": {"content": f"text of {title}"}}
+                pages.append({"title": title, "revisions": [{"slots": slots}]})
+
+        data = {"query": {"pages": pages}}
+        if end < len(titles):
+            data["continue"] = {"rvcontinue": str(end), "continue": "||"}
+        return data
+
+    async def handle(self, request):
+        params = request.query
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            # hold each request open for a bit, so concurrent ones overlap
+            await asyncio.sleep(self.delay)
+            if params.get("list") == "categorymembers":
+                data = self.list_response(
+                    "categorymembers", MEMBERS, params, "cmcontinue"
+                )
+            elif params.get("list") == "backlinks":
+                data = self.list_response("backlinks", BACKLINKS, params, "blcontinue")
+            else:
+                data = self.pages_response(params["titles"].split("|"), params)
+            return web.json_response(data)
+        finally:
+            self.in_flight -= 1
+
+
+def run(stand_in, f, **kwargs):
+    """
+    Run ``f(site)`` with an AsyncSite pointed at ``stand_in``.
+    """
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/w/api.php", stand_in.handle)
+        async with TestServer(app) as server:
+            api_url = str(server.make_url("/w/api.php"))
+            async with AsyncSite(api_url, **kwargs) as site:
+                return await f(site)
+
+    return asyncio.run(main())
+
+
+async def collect(aiterable):
+    return [item async for item in aiterable]
+
+
+def test_category_members_follows_continuation():
+    async def f(site):
+        return await collect(site.category_members("Category:Test"))
+
+    assert run(StandIn(), f) == MEMBERS
+
+
+def test_backlinks():
+    async def f(site):
+        return await collect(site.backlinks("Target"))
+
+    assert run(StandIn(), f) == BACKLINKS
+
+
+def test_page_texts_batches_and_missing_pages():
+    stand_in = StandIn()
+    titles = MEMBERS + ["Missing 1", "Missing 2"]
+
+    async def f(site):
+        return await collect(site.page_texts(titles, batch_size=10))
+
+    texts = dict(run(stand_in, f))
+    assert texts == {
+        **{title: f"text of {title}" for title in MEMBERS},
+        "Missing 1": None,
+        "Missing 2": None,
+    }
+    assert sorted(len(batch) for batch in stand_in.batches) == [7, 10, 10]
+
+
+def test_page_texts_follows_continuation():
+    stand_in = StandIn(contents_size=3)
+    titles = MEMBERS[:10] + ["Missing 1", "Hidden 1"]
+
+    async def f(site):
+        return await collect(site.page_texts(titles, batch_size=50))
+
+    texts = dict(run(stand_in, f))
+    assert texts == {
+        **{title: f"text of {title}" for title in MEMBERS[:10]},
+        "Missing 1": None,
+        "Hidden 1": None,
+    }
+    assert len(stand_in.batches) == 1
+
+
+def test_page_texts_from_async_iterable():
+    stand_in = StandIn()
+
+    async def f(site):
+        members = site.category_members("Category:Test")
+        return await collect(site.page_texts(members, batch_size=5))
+
+    assert sorted(title for title, _ in run(stand_in, f)) == sorted(MEMBERS)
+
+
+def test_concurrency_cap():
+    stand_in = StandIn(delay=0.05)
+    titles = [f"Page {i}" for i in range(40)]
+
+    async def f(site):
+        return await collect(site.page_texts(titles, batch_size=1))
+
+    assert len(run(stand_in, f, concurrency=3)) == 40
+    assert stand_in.max_in_flight == 3
+
+
+def test_api_error():
+    async def f(site):
+        return await collect(site.page_texts(["Bad title"]))
+
+    with pytest.raises(APIError):
+        run(StandIn(), f)
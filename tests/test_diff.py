@@ -0,0 +1,67 @@
+import difflib
+import random
+
+from civwiki_tools.diff import Diff
+
+
+def lcs_length(a, b):
+    previous = [0] * (len(b) + 1)
+    for x in a:
+        current = [0]
+        for j, y in enumerate(b):
+            current.append(
+                previous[j] + 1 if x == y else max(previous[j + 1], current[j])
+            )
+        previous = current
+    return previous[-1]
+
+
+def check_opcodes(diff):
+    # opcodes cover both texts in order, and "equal" really is equal. Returns
+    # the number of matched lines.
+    i = j = matched = 0
+    for tag, i1, i2, j1, j2 in diff.opcodes:
+        assert (i1, j1) == (i, j)
+        if tag == "equal":
+            assert diff.old_lines[i1:i2] == diff.new_lines[j1:j2]
+            matched += i2 - i1
+        i, j = i2, j2
+    assert (i, j) == (len(diff.old_lines), len(diff.new_lines))
+    return matched
+
+
+def test_minimal_for_small_diffs():
+    rng = random.Random(0)
+    for _ in range(500):
+        alphabet = rng.choice(["ab", "abc", "abcdefgh"])
+        old = [rng.choice(alphabet) for _ in range(rng.randint(0, 30))]
+        new = [rng.choice(alphabet) for _ in range(rng.randint(0, 30))]
+        diff = Diff("\n".join(old), "\n".join(new))
+        assert check_opcodes(diff) == lcs_length(diff.old_lines, diff.new_lines)
+
+
+def test_unified_matches_difflib():
+    old = "\n".join(f"line {i}" for i in range(50))
+    new = old.replace("line 10\n", "").replace("line 30", "line thirty")
+    expected = difflib.unified_diff(old.split("\n"), new.split("\n"), lineterm="", n=3)
+    # difflib's ---/+++ headers include file names, ours don't
+    assert Diff(old, new).unified().split("\n")[2:] == list(expected)[2:]
+
+
+def test_large_repetitive_edit():
+    # a big table of mostly repeated lines, with thousands of scattered one
+    # line edits: far past the point where Myers gives up.
+    rng = random.Random(0)
+    cells = ["|-", "| a", "| b", "|}", "| c"]
+    old = [
+        f"| row {i}" if rng.random() < 0.05 else rng.choice(cells) for i in range(20000)
+    ]
+    new = list(old)
+    for i in rng.sample(range(len(new)), 3000):
+        new[i] = rng.choice(cells + [f"| edit {i}"])
+    changed = sum(a != b for a, b in zip(old, new))
+
+    diff = Diff("\n".join(old), "\n".join(new))
+    check_opcodes(diff)
+    removed = sum(i2 - i1 for tag, i1, i2, _, _ in diff.opcodes if tag != "equal")
+    assert removed <= changed
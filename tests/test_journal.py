@@ -0,0 +1,46 @@
+import pytest
+
+from civwiki_tools import journal
+from civwiki_tools.journal import Journal
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(journal, "CACHE", tmp_path)
+
+
+def test_resume():
+    first = Journal("job", {"server": "civmc"})
+    first.plan(["A", "B"])
+    first.complete("A")
+
+    resumed = Journal("job", {"server": "civmc"}, resume=True)
+    assert resumed.is_done("A")
+    assert not resumed.is_done("B")
+
+
+def test_other_params_keep_their_own_journal():
+    interrupted = Journal("job", {"server": "civmc", "factory": "all"})
+    interrupted.plan(["A", "B"])
+    interrupted.complete("A")
+
+    # a fresh run of the same script for something else
+    other = Journal("job", {"server": "civclassic", "factory": "Ore Smelter"})
+    other.plan(["C"])
+    other.complete("C")
+
+    resumed = Journal("job", {"server": "civmc", "factory": "all"}, resume=True)
+    assert resumed.is_done("A")
+    assert not resumed.is_done("C")
+
+
+def test_cut_short_entry_is_dropped():
+    first = Journal("job")
+    first.plan(["A", "B"])
+    first.complete("A")
+    first.file.write('{"op": "complete", "title": "B"')
+    first.file.close()
+
+    resumed = Journal("job", resume=True)
+    assert resumed.is_done("A")
+    assert not resumed.is_done("B")
@@ -0,0 +1,41 @@
+from pathlib import Path
+
+import yaml
+
+from civwiki_tools.factorymod import parse_factorymod
+from civwiki_tools.planner import Plans, plan
+
+RESOURCES = Path(__file__).parent.parent / "resources"
+
+
+def civcraft_plans():
+    with open(RESOURCES / "civcraft 3.0.yaml") as f:
+        data = yaml.safe_load(f)
+    return plan(parse_factorymod(data, index=True), key="test")
+
+
+def test_every_item_comes_from_raw_materials():
+    plans = civcraft_plans()
+    assert plans.choices
+    for item in plans.choices:
+        assert plans.raw_materials(item), item
+
+
+def test_net_gains_are_flagged():
+    # andesite and polished andesite are both STONE, so polishing looks like
+    # it makes 88 stone from 64
+    plans = civcraft_plans()
+    assert not plans.converged
+    polish = ("Fancy Stone Smelter", "Craft Polished Andesite", "STONE")
+    assert polish in plans.net_gains
+    assert plans.choices["STONE"].recipe == "Smelt Stone"
+
+
+def test_save_and_load(tmp_path):
+    plans = civcraft_plans()
+    path = tmp_path / "plans.json"
+    plans.save(path)
+    loaded = Plans.load(path, "test")
+    assert loaded.costs == plans.costs
+    assert loaded.net_gains == plans.net_gains
+    assert Plans.load(path, "other") is None
@@ -0,0 +1,149 @@
+from typing import NamedTuple
+
+from pywikibot.site import BaseSite
+
+from civwiki_tools.family import Family
+from civwiki_tools.rules import (
+    CategoryRewrite,
+    RegexSub,
+    RuleEngine,
+    TemplateRename,
+    targets,
+)
+
+# rules and the RuleEngine against in-memory stand-ins for the wiki, page
+# cache and journal.
+
+
+class OfflineSite(BaseSite):
+    """
+    Just enough of a civwiki site to parse and write category links, without
+    talking to the wiki.
+    """
+
+    def namespace(self, num, all_ns=False):
+        if all_ns:
+            return list(self.namespaces[num])
+        return self.namespaces[num].custom_name
+
+    def getmagicwords(self, word):
+        return {"defaultsort": ["DEFAULTSORT"]}.get(word, [word])
+
+    def has_extension(self, name):
+        return False
+
+
+class CachedPage(NamedTuple):
+    title: str
+    revid: int | None
+    text: str
+
+
+class FakePage:
+    def __init__(self, title, text):
+        self._title = title
+        self.text = text
+        self.saved = []
+
+    def title(self):
+        return self._title
+
+    def full_url(self):
+        return f"https://civwiki.org/wiki/{self._title}"
+
+    def save(self, summary):
+        self.saved.append((self.text, summary))
+
+
+class FakeSite:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def page(self, title):
+        return self.pages[title]
+
+
+class FakeCache:
+    def __init__(self, pages):
+        self.site = FakeSite(pages)
+        self.pages = pages
+
+    def get(self, title):
+        return CachedPage(title, 1, self.pages[title].text)
+
+    def preload(self, titles):
+        pass
+
+    def update(self, page):
+        pass
+
+
+class FakeJournal:
+    def __init__(self):
+        self.completed = []
+
+    def plan(self, titles):
+        pass
+
+    def is_done(self, title):
+        return False
+
+    def complete(self, title):
+        self.completed.append(title)
+
+
+def test_category_rewrite_keeps_sort_keys():
+    rule = CategoryRewrite(
+        {"Category:CivMC": "Category:Civilizations (CivMC)", "Category:Old": None},
+        site=OfflineSite("en", Family()),
+    )
+    text = (
+        "Some text\n"
+        "[[Category:Towns|Zed]]\n"
+        "[[Category:CivMC|Key]]\n"
+        "[[Category:Old]]\n"
+        "[[Category:Civilizations]]"
+    )
+    new_text, summary = rule.apply(text)
+    assert new_text.endswith(
+        "[[Category:Towns|Zed]]\n"
+        "[[Category:Civilizations (CivMC)|Key]]\n"
+        "[[Category:Civilizations]]"
+    )
+    assert "[[Category:Old]]" not in new_text
+    assert summary == "recategorize [[:Category:CivMC]], [[:Category:Old]]"
+
+
+def test_category_rewrite_unchanged():
+    rule = CategoryRewrite({"Category:CivMC": None}, site=OfflineSite("en", Family()))
+    text = "[[Category:Towns|Zed]]"
+    assert rule.apply(text) == (text, None)
+
+
+def test_targets_keep_each_rule_to_its_own_pages():
+    a = RegexSub("x", "y")
+    b = RegexSub("y", "z")
+    assert targets([(a, ["A", "Both"]), (b, ["Both", "B"])]) == {
+        "A": [a],
+        "Both": [a, b],
+        "B": [b],
+    }
+
+
+def test_rules_only_apply_to_their_pages():
+    pages = {
+        title: FakePage(title, "x {{Old}}") for title in ["Regex", "Template", "Both"]
+    }
+    regex = RegexSub("x", "y")
+    rename = TemplateRename("Old", "New")
+    journal = FakeJournal()
+    engine = RuleEngine(cache=FakeCache(pages), journal=journal)
+
+    engine.run(targets([(regex, ["Regex", "Both"]), (rename, ["Template", "Both"])]))
+
+    assert pages["Regex"].text == "y {{Old}}"
+    assert pages["Template"].text == "x {{New}}"
+    assert pages["Both"].text == "y {{New}}"
+    # one save per page, no matter how many rules changed it
+    assert [len(page.saved) for page in pages.values()] == [1, 1, 1]
+    assert sorted(journal.completed) == ["Both", "Regex", "Template"]